@@ -1,22 +1,43 @@
 import re
 import os
 import ssl
+import copy
+import json
+import fcntl
+import hashlib
 import uuid
+import queue
+import time
+import zlib
 import shutil
+import sqlite3
 import logging
 import tempfile
 import zipfile
+import mimetypes
+import subprocess
 from datetime import datetime, timedelta
-from threading import Thread
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Thread, Lock, BoundedSemaphore, Condition, Event, local
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 from io import BytesIO
+from urllib.parse import urlparse, parse_qs, quote
+import math
 import random
+import socket
+import itertools
+import unicodedata
 
 import certifi
 import requests
-from PIL import Image
-from flask import Flask, request, jsonify, send_file
+from PIL import Image, features
+from requests.adapters import HTTPAdapter
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import FFmpegPostProcessor
+from yt_dlp.utils import DownloadCancelled
 
 # Configure logging
 logging.basicConfig(
@@ -54,12 +75,143 @@ CORS(app, origins="*")  # Restrict CORS origins
 THUMBNAIL_DIR = "thumbnails"
 DOWNLOAD_DIR = "downloads"
 MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB limit
+AUDIO_OUTPUT_BITRATES = {"wav": 1411}  # kbit/s of transcoded audio when no quality applies
 CLEANUP_INTERVAL = 3600  # 1 hour
 FILE_EXPIRY = 24 * 3600  # 24 hours
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1MB
+STREAM_THROUGH_MUXERS = {  # Output format -> ffmpeg muxer arguments that never seek back
+    "mp4": ["-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof"],
+    "m4a": ["-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof"],
+    "webm": ["-f", "webm"],
+    "mkv": ["-f", "matroska"],
+    "opus": ["-f", "opus"],
+    "aac": ["-f", "adts"],
+    "mp3": ["-f", "mp3"]
+}
+STREAM_THROUGH_CODECS = {  # Output format -> (video, audio) codecs its muxer takes as a stream copy; None takes any
+    "mp4": ({"avc1", "h264", "hev1", "hvc1", "av01", "vp09", "vp9"}, {"mp4a", "aac", "mp3", "ac-3", "ec-3"}),
+    "m4a": (set(), {"mp4a", "aac"}),
+    "webm": ({"vp8", "vp08", "vp9", "vp09", "av01"}, {"opus", "vorbis"}),
+    "mkv": (None, None),
+    "opus": (set(), {"opus"}),
+    "aac": (set(), {"mp4a", "aac"}),
+    "mp3": (set(), {"mp3"})
+}
+AUDIO_COPY_CODECS = {  # Audio output -> source codecs it can hold without re-encoding
+    "m4a": ("mp4a", "aac"),
+    "aac": ("mp4a", "aac"),
+    "opus": ("opus",),
+    "mp3": ("mp3",)
+}
+AUDIO_COPY_BITRATE_SLACK = 1.25  # A stream up to this much over the requested kbit/s is still copied
+
+# Background download jobs
+JOB_DIR = os.environ.get("JOB_DIR", "jobs")  # Put on a shared volume to run worker.py on other nodes
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))  # Job threads per API process; 0 leaves jobs to worker.py
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 20))  # Jobs waiting across all workers
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))  # Runs of a job before an interrupted one is given up
+JOB_LEASE_TIMEOUT = int(os.environ.get("JOB_LEASE_TIMEOUT", 120))  # Seconds without a heartbeat before a job is redelivered
+JOB_HEARTBEAT_INTERVAL = int(os.environ.get("JOB_HEARTBEAT_INTERVAL", 30))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 2))  # Seconds between queue polls when idle
+JOB_ID_REGEX = r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+
+# Disk budget for finished downloads, enforced whenever one is written
+STORAGE_BUDGET_BYTES = int(os.environ.get("STORAGE_BUDGET_BYTES", 5 * 1024 * 1024 * 1024))  # 5GB
+STORAGE_PIN_TIMEOUT = 6 * 3600  # Pins left behind by a crashed worker lapse after 6 hours
+
+# Metrics
+METRICS_FLUSH_INTERVAL = 5  # Seconds between publishing this worker's metrics
+METRICS_STALE_AFTER = 60  # Gauges from workers silent this long are dropped
+METRICS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Finished downloads reused across identical requests
+ARTIFACT_EXPIRY_MARGIN = 3600  # Stop serving cached artifacts an hour before cleanup removes them
+
+# Download progress events
+PROGRESS_ID_REGEX = r'^[A-Za-z0-9_-]{8,64}$'
+PROGRESS_INTERVAL = float(os.environ.get("PROGRESS_INTERVAL", 0.5))  # Min seconds between updates
+PROGRESS_IDLE_TIMEOUT = 600  # Close progress streams after 10 minutes without updates
+PROGRESS_HEARTBEAT = 15
+
+# Playlist downloads
+PLAYLIST_CONCURRENCY = int(os.environ.get("PLAYLIST_CONCURRENCY", 4))  # Entry downloads per process
+PLAYLIST_JOB_CONCURRENCY = int(os.environ.get("PLAYLIST_JOB_CONCURRENCY", 2))  # Default per playlist
+PLAYLIST_PAGE_SIZE = 100  # Default entries per page of a flat playlist listing
+PLAYLIST_PAGE_MAX = 1000
+YOUTUBE_PLAYLIST_PAGE_ENTRIES = 100  # Entries YouTube returns per playlist continuation request
+
+# FFmpeg post-processing slots shared by all workers on this host
+POSTPROCESS_WORKERS = int(os.environ.get("POSTPROCESS_WORKERS", os.cpu_count() or 2))  # Concurrent FFmpeg steps
+POSTPROCESS_QUEUE_SIZE = int(os.environ.get("POSTPROCESS_QUEUE_SIZE", 8))  # Waiting steps per process before new downloads are refused
+POSTPROCESS_POLL_INTERVAL = 0.2
+
+# Batch metadata requests
+INFO_BATCH_MAX_URLS = 100
+INFO_BATCH_CONCURRENCY = int(os.environ.get("INFO_BATCH_CONCURRENCY", 8))  # Extractions per process
+INFO_BATCH_MAX_WAIT = float(os.environ.get("INFO_BATCH_MAX_WAIT", 20))  # Seconds an item waits for a token before its 429
+
+# Metadata cache shared by all workers
+CACHE_DIR = "cache"  # Per-host state (metadata, metrics, rate limits, FFmpeg slots); share it with every container on the host, never between hosts
+METADATA_CACHE_TTL = int(os.environ.get("METADATA_CACHE_TTL", 1800))  # 30 minutes
+METADATA_CACHE_MAX_ENTRIES = int(os.environ.get("METADATA_CACHE_MAX_ENTRIES", 1000))
+METADATA_CACHE_MAX_BYTES = int(os.environ.get("METADATA_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+URL_EXPIRY_MARGIN = 600  # Drop entries 10 minutes before signed format URLs expire
+
+# Reusable YoutubeDL instances for metadata extraction
+YDL_POOL_MAX_IDLE = int(os.environ.get("YDL_POOL_MAX_IDLE", 4))  # Idle instances kept per endpoint
+YDL_POOL_MAX_USES = int(os.environ.get("YDL_POOL_MAX_USES", 100))  # Requests served before an instance is rebuilt
+YDL_POOL_PREFILL = int(os.environ.get("YDL_POOL_PREFILL", 2))  # Instances built per endpoint when a worker starts
+
+# Extraction scheduling shared by all workers on a host; each node has its own, so N nodes extract up to N times EXTRACT_RATE
+EXTRACT_RATE = float(os.environ.get("EXTRACT_RATE", 1.0))  # Extractions per second per endpoint per node
+EXTRACT_BURST = int(os.environ.get("EXTRACT_BURST", 10))
+EXTRACT_BULK_RESERVE = int(os.environ.get("EXTRACT_BULK_RESERVE", 3))  # Tokens bulk work leaves for interactive requests
+EXTRACT_BACKOFF_BASE = 30  # Seconds an endpoint is paused after its first 429, doubling per repeat
+EXTRACT_BACKOFF_MAX = 1800
+EXTRACT_MAX_WAIT = {  # Seconds a request waits for a token before giving up with a 429
+    "interactive": float(os.environ.get("EXTRACT_MAX_WAIT_INTERACTIVE", 20)),
+    "bulk": float(os.environ.get("EXTRACT_MAX_WAIT_BULK", 1800))
+}
+# Comma-separated pools; each endpoint pairs one proxy with one cookie file
+EXTRACT_PROXIES = [p.strip() for p in os.environ.get("YT_PROXIES", "").split(",") if p.strip()] or [os.environ.get("YT_PROXY") or None]
+EXTRACT_COOKIE_FILES = [os.path.expanduser(c.strip()) for c in os.environ.get("YT_COOKIE_FILES", "").split(",") if c.strip()] or [None]
+
+# Thumbnail fetching
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", 8))
+THUMBNAIL_FETCH_TIMEOUT = 15  # Seconds a thumbnail request waits for a pending fetch
+THUMBNAIL_RETRY_AFTER = 5  # Seconds clients are asked to wait when the fetch is still running
+THUMBNAIL_FAILURE_TTL = 300  # Seconds a failed fetch is remembered before the ID is tried again
+THUMBNAIL_FAILURE_MAX_ENTRIES = 10000  # Failed IDs remembered per process
+THUMBNAIL_FALLBACK_URL = "https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+THUMBNAIL_SIZES = {  # Largest first; each variant is scaled down from the previous one
+    "full": (1280, 720),
+    "card": (640, 360),
+    "list": (320, 180)
+}
+THUMBNAIL_FORMATS = {"jpeg": ("jpg", "image/jpeg")}
+if features.check("webp"):
+    THUMBNAIL_FORMATS["webp"] = ("webp", "image/webp")
+THUMBNAIL_MEMORY_CACHE_BYTES = int(os.environ.get("THUMBNAIL_MEMORY_CACHE_BYTES", 32 * 1024 * 1024))
+THUMBNAIL_MAX_AGE = FILE_EXPIRY * 7  # Matches how long thumbnails are kept on disk
 
 # Create directories
 os.makedirs(THUMBNAIL_DIR, exist_ok=True)
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+os.makedirs(JOB_DIR, exist_ok=True)
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+class DownloadError(Exception):
+    """Download failure carrying the HTTP status code to report"""
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+def is_rate_limited(e):
+    """Whether an extraction or download error means YouTube is throttling us"""
+    if isinstance(e, DownloadError):
+        return e.status_code == 429
+    return "HTTP Error 429" in str(e)
 
 class YouTubeDownloader:
     def __init__(self):
@@ -99,10 +251,11 @@ class YouTubeDownloader:
 
     def get_info_opts(self):
         opts = self.base_ydl_opts.copy()
-        opts["http_headers"]["User-Agent"] = get_random_user_agent()  # Rotate UA for each request
+        # Fresh headers dict: mutating the shared one raced between concurrent requests
+        opts["http_headers"] = dict(opts["http_headers"], **{"User-Agent": get_random_user_agent()})
         return opts
     
-    def get_download_opts(self, format_type, quality, output_path, audio_only=False):
+    def get_download_opts(self, format_type, quality, output_path, audio_only=False, info=None):
         opts = self.base_ydl_opts.copy()
         opts.update({
             "skip_download": False,
@@ -113,8 +266,9 @@ class YouTubeDownloader:
         })
         
         if audio_only:
+            # FFmpegExtractAudio stream-copies when the source codec already fits the output
             opts.update({
-                "format": "bestaudio/best",
+                "format": self.plan_audio(format_type, quality, info)["format"],
                 "postprocessors": [{
                     'key': 'FFmpegExtractAudio',
                     'preferredcodec': format_type,
@@ -131,6 +285,21 @@ class YouTubeDownloader:
             
         return opts
     
+    def plan_audio(self, format_type, quality, info=None):
+        """Choose the audio source of a download as {"format": spec, "copy": bool}"""
+        # A numeric quality caps the source bitrate; formats without a known bitrate are allowed
+        cap = f"[abr<=?{int(quality) * AUDIO_COPY_BITRATE_SLACK:g}]" if str(quality).isdigit() else ""
+        copy_spec = "/".join(f"bestaudio[acodec^={codec}]{cap}" for codec in AUDIO_COPY_CODECS.get(format_type, ()))
+        if not copy_spec or not info or not info.get("formats"):
+            return {"format": "bestaudio/best", "copy": False}
+        try:
+            # yt-dlp ranks the candidates, so the original language wins over dubs and DRM formats are skipped
+            source = select_formats(info, copy_spec)[0]
+        except Exception:
+            # Nothing copyable within the cap; bestaudio is transcoded
+            return {"format": "bestaudio/best", "copy": False}
+        return {"format": source["format_id"], "copy": True}
+    
     def _get_format_selector(self, quality):
         """Get format selector based on quality preference"""
         if quality == "best":
@@ -156,8 +325,52 @@ def validate_url(url):
     
     return True, "valid"
 
+# Shared keep-alive session for thumbnail downloads
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=THUMBNAIL_WORKERS))
+http_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=THUMBNAIL_WORKERS))
+
+thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+_pending_thumbnails = {}
+_pending_thumbnails_lock = Lock()
+# video_id -> when a failed fetch may be retried, oldest first; guarded by _pending_thumbnails_lock
+_failed_thumbnails = OrderedDict()
+
+def thumbnail_variant_path(video_id, size, fmt):
+    """On-disk path of a thumbnail variant; full JPEG keeps the original <id>.jpg name"""
+    if size == "full" and fmt == "jpeg":
+        return os.path.join(THUMBNAIL_DIR, f"{video_id}.jpg")
+    return os.path.join(THUMBNAIL_DIR, f"{video_id}_{size}.{THUMBNAIL_FORMATS[fmt][0]}")
+
+def write_thumbnail_variants(video_id, image):
+    """Encode every size and format variant from one decoded image"""
+    # Convert to RGB if necessary
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    variants = []
+    for size, bounds in THUMBNAIL_SIZES.items():
+        # Resize if too large
+        if image.size[0] > bounds[0] or image.size[1] > bounds[1]:
+            image = image.copy()
+            image.thumbnail(bounds, Image.Resampling.LANCZOS)
+        for fmt in THUMBNAIL_FORMATS:
+            variants.append((thumbnail_variant_path(video_id, size, fmt), fmt, image))
+    # The full-size JPEG goes last, so its presence means the set is complete
+    variants.sort(key=lambda variant: variant[0] == thumbnail_variant_path(video_id, "full", "jpeg"))
+    
+    for path, fmt, variant in variants:
+        # Write atomically so a concurrent request never serves a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        if fmt == "webp":
+            variant.save(tmp_path, "WEBP", quality=80, method=4)
+        else:
+            variant.save(tmp_path, "JPEG", quality=85, optimize=True)
+        os.replace(tmp_path, path)
+        storage.register(path, "thumbnail")
+
 def save_thumbnail(info):
-    """Save video thumbnail with error handling"""
+    """Save video thumbnail variants with error handling"""
     try:
         thumbnail_url = info.get("thumbnail")
         video_id = info.get("id")
@@ -167,36 +380,107 @@ def save_thumbnail(info):
             return None
         
         # Check if thumbnail already exists
-        thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{video_id}.jpg")
+        thumbnail_path = thumbnail_variant_path(video_id, "full", "jpeg")
         if os.path.exists(thumbnail_path):
             return thumbnail_path
         
-        response = requests.get(thumbnail_url, timeout=10, headers={"User-Agent": get_random_user_agent()})
-        response.raise_for_status()
+        with metrics.stage("thumbnail_fetch"):
+            response = http_session.get(thumbnail_url, timeout=10, headers={"User-Agent": get_random_user_agent()})
+            response.raise_for_status()
         
-        # Validate image
-        image = Image.open(BytesIO(response.content))
-        image.verify()  # Verify it's a valid image
-        
-        # Reopen for processing (verify() closes the file)
-        image = Image.open(BytesIO(response.content))
-        
-        # Resize if too large
-        if image.size[0] > 1280 or image.size[1] > 720:
-            image.thumbnail((1280, 720), Image.Resampling.LANCZOS)
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        image.save(thumbnail_path, "JPEG", quality=85, optimize=True)
+        with metrics.stage("thumbnail_encode"):
+            # Decode once; load() raises on anything that is not a valid image
+            image = Image.open(BytesIO(response.content))
+            image.load()
+            write_thumbnail_variants(video_id, image)
         logger.info(f"Saved thumbnail for {video_id}")
         return thumbnail_path
         
     except Exception as e:
         logger.error(f"Error saving thumbnail for {info.get('id', 'unknown')}: {str(e)}")
+        if info.get("id"):
+            with _pending_thumbnails_lock:
+                _failed_thumbnails.pop(info["id"], None)
+                _failed_thumbnails[info["id"]] = time.time() + THUMBNAIL_FAILURE_TTL
+                while len(_failed_thumbnails) > THUMBNAIL_FAILURE_MAX_ENTRIES:
+                    _failed_thumbnails.popitem(last=False)
         return None
 
+def schedule_thumbnail(info):
+    """Fetch a thumbnail on the background pool, sharing any fetch already in flight"""
+    video_id = info.get("id")
+    with _pending_thumbnails_lock:
+        future = _pending_thumbnails.get(video_id)
+        if future is None:
+            future = thumbnail_executor.submit(save_thumbnail, {"id": video_id, "thumbnail": info.get("thumbnail")})
+            _pending_thumbnails[video_id] = future
+            future.add_done_callback(lambda _: _pending_thumbnails.pop(video_id, None))
+    return future
+
+def ensure_thumbnail(video_id):
+    """Return the thumbnail path for video_id, fetching it first if needed"""
+    thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{video_id}.jpg")
+    if os.path.exists(thumbnail_path):
+        return thumbnail_path
+    
+    # IDs that just failed, e.g. ones that do not exist, are not fetched again until the failure expires
+    with _pending_thumbnails_lock:
+        retry_at = _failed_thumbnails.get(video_id)
+        if retry_at is not None:
+            if retry_at > time.time():
+                return None
+            del _failed_thumbnails[video_id]
+    
+    future = _pending_thumbnails.get(video_id) or schedule_thumbnail({
+        "id": video_id,
+        "thumbnail": THUMBNAIL_FALLBACK_URL.format(video_id=video_id)
+    })
+    return future.result(timeout=THUMBNAIL_FETCH_TIMEOUT)
+
+def load_thumbnail_variant(video_id, size, fmt):
+    """Return the encoded bytes of a thumbnail variant, fetching or rebuilding it if needed"""
+    path = thumbnail_variant_path(video_id, size, fmt)
+    if not os.path.exists(path):
+        full_path = ensure_thumbnail(video_id)
+        if not full_path:
+            return None
+        if not os.path.exists(path):
+            # Thumbnails saved before variants existed, or partly cleaned up
+            with Image.open(full_path) as image:
+                image.load()
+                write_thumbnail_variants(video_id, image)
+    with open(path, "rb") as f:
+        return f.read()
+
+class ThumbnailMemoryCache:
+    """In-process LRU of encoded thumbnail variants, bounded by total bytes"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key, data):
+        entry = (data, hashlib.sha256(data).hexdigest()[:32])
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key)[0])
+            self._entries[key] = entry
+            self._size += len(data)
+            while self._size > self.max_bytes and self._entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return entry
+
+thumbnail_memory_cache = ThumbnailMemoryCache(THUMBNAIL_MEMORY_CACHE_BYTES)
+
 def get_available_qualities(info, audio_only=False):
     """Extract available video or audio qualities"""
     try:
@@ -239,33 +523,15 @@ def get_available_qualities(info, audio_only=False):
         return ["best", "worst"]
 
 def cleanup_old_files():
-    """Clean up old downloaded files and thumbnails"""
+    """Clean up old downloaded files, job records and thumbnails"""
     try:
-        current_time = datetime.now()
-        
-        # Clean download directory
-        for item in os.listdir(DOWNLOAD_DIR):
-            item_path = os.path.join(DOWNLOAD_DIR, item)
-            if os.path.isfile(item_path):
-                file_time = datetime.fromtimestamp(os.path.getctime(item_path))
-                if (current_time - file_time).total_seconds() > FILE_EXPIRY:
-                    os.remove(item_path)
-                    logger.info(f"Cleaned up old file: {item}")
-            elif os.path.isdir(item_path):
-                dir_time = datetime.fromtimestamp(os.path.getctime(item_path))
-                if (current_time - dir_time).total_seconds() > FILE_EXPIRY:
-                    shutil.rmtree(item_path)
-                    logger.info(f"Cleaned up old directory: {item}")
-        
-        # Clean thumbnail directory
-        for item in os.listdir(THUMBNAIL_DIR):
-            item_path = os.path.join(THUMBNAIL_DIR, item)
-            if os.path.isfile(item_path):
-                file_time = datetime.fromtimestamp(os.path.getctime(item_path))
-                if (current_time - file_time).total_seconds() > FILE_EXPIRY * 7:  # Keep thumbnails longer
-                    os.remove(item_path)
-                    logger.info(f"Cleaned up old thumbnail: {item}")
-                    
+        storage.expire("download", FILE_EXPIRY)
+        storage.expire("session", FILE_EXPIRY)
+        storage.expire("partial", FILE_EXPIRY)
+        storage.expire("job", FILE_EXPIRY)
+        job_queue.expire(FILE_EXPIRY)
+        storage.expire("thumbnail", FILE_EXPIRY * 7)  # Keep thumbnails longer
+        storage.enforce_budget()
     except Exception as e:
         logger.error(f"Error during cleanup: {str(e)}")
 
@@ -283,15 +549,980 @@ def format_duration(seconds):
     else:
         return f"{minutes:02d}:{seconds:02d}"
 
-def is_video_available(url):
-    """Check if video is available before downloading"""
+class SQLiteStore:
+    """Base for SQLite-backed state shared by all worker processes"""
+    schema = ()
+    journal_mode = "WAL"
+    
+    def __init__(self, path):
+        self.path = path
+        self._local = local()
+        # Set up the schema on a throwaway connection so none leaks across fork()
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            for statement in self.schema:
+                conn.execute(statement)
+        finally:
+            conn.close()
+    
+    def _connect(self):
+        """One connection per thread; sqlite3 connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        # With preload_app the master's main-thread connection is inherited by forked workers
+        if conn is None or self._local.process != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+            self._local.process = os.getpid()
+        return conn
+
+class MetadataCache(SQLiteStore):
+    """SQLite-backed cache of extract_info results shared across worker processes"""
+    schema = (
+        "CREATE TABLE IF NOT EXISTS entries ("
+        "key TEXT PRIMARY KEY, data BLOB, size INTEGER, "
+        "expires_at REAL, last_access REAL)",
+        "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)",
+        "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)",
+        "INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), ('evictions', 0)"
+    )
+    
+    def __init__(self, path, ttl, max_entries, max_bytes):
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+    
+    def _count(self, conn, name, amount=1):
+        conn.execute("UPDATE stats SET value = value + ? WHERE name = ?", (amount, name))
+    
+    def get(self, key):
+        """Return the cached info dict for key, or None"""
+        try:
+            conn = self._connect()
+            now = time.time()
+            row = conn.execute(
+                "SELECT data FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._count(conn, "hits")
+            return json.loads(zlib.decompress(row[0]))
+        except Exception as e:
+            logger.error(f"Metadata cache read failed for {key}: {str(e)}")
+            return None
+    
+    def set(self, key, info):
+        """Store an info dict and evict expired or least recently used entries"""
+        try:
+            data = zlib.compress(json.dumps(info).encode("utf-8"))
+            now = time.time()
+            expires_at = now + self.ttl
+            url_expiry = earliest_url_expiry(info)
+            if url_expiry:
+                expires_at = min(expires_at, url_expiry - URL_EXPIRY_MARGIN)
+            if expires_at <= now:
+                return
+            
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (key, data, len(data), expires_at, now)
+                )
+                conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            logger.error(f"Metadata cache write failed for {key}: {str(e)}")
+    
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self._count(conn, "evictions", len(evicted))
+    
+    def stats(self):
+        conn = self._connect()
+        stats = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats.update({
+            "entries": count,
+            "bytes": total,
+            "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0
+        })
+        return stats
+
+metadata_cache = MetadataCache(
+    os.path.join(CACHE_DIR, "metadata.sqlite3"),
+    METADATA_CACHE_TTL, METADATA_CACHE_MAX_ENTRIES, METADATA_CACHE_MAX_BYTES
+)
+
+def path_size(path):
+    """Size of a file, or of everything under a directory"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # Removed while walking
+    return total
+
+class StorageManager(SQLiteStore):
+    """Index of files the server writes, with size, age and last access"""
+    schema = (
+        "CREATE TABLE IF NOT EXISTS files ("
+        "path TEXT PRIMARY KEY, category TEXT, size INTEGER, "
+        "created_at REAL, last_access REAL)",
+        "CREATE INDEX IF NOT EXISTS files_access ON files (category, last_access)",
+        "CREATE INDEX IF NOT EXISTS files_created ON files (category, created_at)",
+        "CREATE TABLE IF NOT EXISTS pins (token TEXT PRIMARY KEY, path TEXT, expires_at REAL)",
+        "CREATE INDEX IF NOT EXISTS pins_path ON pins (path)",
+        "CREATE TABLE IF NOT EXISTS totals (category TEXT PRIMARY KEY, bytes INTEGER)"
+    )
+    # Categories that count against the budget and may be evicted to meet it
+    budget_categories = ("download", "partial")
+    _not_pinned = "NOT EXISTS (SELECT 1 FROM pins WHERE pins.path = files.path AND pins.expires_at > ?)"
+    # Shared along with DOWNLOAD_DIR, and WAL only works between processes on one host
+    journal_mode = "DELETE"
+    
+    def __init__(self, path, budget):
+        super().__init__(path)
+        self.budget = budget
+    
+    def _transaction(self, work):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def _add_total(self, conn, category, amount):
+        conn.execute(
+            "INSERT INTO totals VALUES (?, ?) ON CONFLICT(category) DO UPDATE SET bytes = bytes + excluded.bytes",
+            (category, amount)
+        )
+    
+    def _delete_row(self, conn, path):
+        row = conn.execute("SELECT category, size FROM files WHERE path = ?", (path,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._add_total(conn, row[0], -row[1])
+    
+    def register(self, path, category, created_at=None):
+        """Index a file or directory; budgeted ones may evict older ones to stay in budget"""
+        try:
+            size = path_size(path)
+            now = time.time()
+            
+            def work(conn):
+                self._delete_row(conn, path)
+                conn.execute(
+                    "INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                    (path, category, size, created_at or now, now)
+                )
+                self._add_total(conn, category, size)
+            self._transaction(work)
+            
+            if category in self.budget_categories:
+                self.enforce_budget(keep=path)
+        except Exception as e:
+            logger.error(f"Error indexing {path}: {str(e)}")
+    
+    def unregister(self, path):
+        try:
+            self._transaction(lambda conn: self._delete_row(conn, path))
+        except Exception as e:
+            logger.error(f"Error unindexing {path}: {str(e)}")
+    
+    def touch(self, path):
+        try:
+            self._connect().execute("UPDATE files SET last_access = ? WHERE path = ?", (time.time(), path))
+        except Exception as e:
+            logger.error(f"Error updating access time for {path}: {str(e)}")
+    
+    def pin(self, path):
+        """Protect a file from eviction and expiry until unpin() is called"""
+        token = uuid.uuid4().hex
+        self._connect().execute(
+            "INSERT INTO pins VALUES (?, ?, ?)", (token, path, time.time() + STORAGE_PIN_TIMEOUT)
+        )
+        return token
+    
+    def unpin(self, token):
+        try:
+            self._connect().execute("DELETE FROM pins WHERE token = ? OR expires_at <= ?", (token, time.time()))
+        except Exception as e:
+            logger.error(f"Error releasing pin {token}: {str(e)}")
+    
+    def _remove_rows(self, select, params):
+        """Delete files selected (oldest first) in small batches until select returns nothing"""
+        removed = 0
+        while True:
+            def work(conn):
+                rows = conn.execute(select, params()).fetchall()
+                for (path,) in rows:
+                    remove_stored_path(path)
+                    self._delete_row(conn, path)
+                return len(rows)
+            batch = self._transaction(work)
+            if not batch:
+                return removed
+            removed += batch
+    
+    def enforce_budget(self, keep=None):
+        """Evict least recently used downloads and partial downloads until the budget is met"""
+        categories = ", ".join("?" * len(self.budget_categories))
+        
+        def over_budget(conn):
+            row = conn.execute(
+                f"SELECT SUM(bytes) FROM totals WHERE category IN ({categories})", self.budget_categories
+            ).fetchone()
+            return (row[0] or 0) > self.budget
+        
+        def oldest(conn, category):
+            # One category per query so the (category, last_access) index gives the order without a sort
+            return conn.execute(
+                f"SELECT last_access, path FROM files WHERE category = ? AND path != ? AND {self._not_pinned} "
+                "ORDER BY last_access LIMIT 1",
+                (category, keep or "", time.time())
+            ).fetchone()
+        
+        conn = self._connect()
+        evicted = 0
+        while over_budget(conn):
+            heads = [head for head in (oldest(conn, category) for category in self.budget_categories) if head]
+            row = min(heads)[1:] if heads else None
+            if row is None:
+                logger.warning("Storage budget exceeded but every download is in use")
+                break
+            
+            def work(conn, path=row[0]):
+                remove_stored_path(path)
+                self._delete_row(conn, path)
+            self._transaction(work)
+            evicted += 1
+            logger.info(f"Evicted {row[0]} to stay within storage budget")
+        return evicted
+    
+    def expire(self, category, max_age):
+        """Remove files of a category older than max_age seconds"""
+        return self._remove_rows(
+            f"SELECT path FROM files WHERE category = ? AND created_at < ? AND {self._not_pinned} "
+            "ORDER BY created_at LIMIT 100",
+            lambda: (category, time.time() - max_age, time.time())
+        )
+    
+    def reconcile(self, directories):
+        """One-off scan that indexes files written before the index existed and drops stale rows"""
+        conn = self._connect()
+        known = {path for (path,) in conn.execute("SELECT path FROM files")}
+        for category, directory in directories.items():
+            for item in os.listdir(directory):
+                path = os.path.join(directory, item)
+                if path in known or item.endswith((".tmp", ".lock", ".sqlite3", ".sqlite3-journal")) or re.match(r'^artifact_\w+\.json$', item):
+                    continue
+                item_category = category
+                if category == "download" and os.path.isdir(path):
+                    item_category = "partial" if item.startswith("partial_") else "session"
+                self.register(path, item_category, created_at=os.path.getctime(path))
+        for path in known:
+            if not os.path.exists(path):
+                self.unregister(path)
+    
+    def stats(self):
+        conn = self._connect()
+        totals = dict(conn.execute("SELECT category, bytes FROM totals").fetchall())
+        counts = dict(conn.execute("SELECT category, COUNT(*) FROM files GROUP BY category").fetchall())
+        return {"budget_bytes": self.budget, "bytes": totals, "files": counts}
+
+# Kept next to the files it indexes, which may be a volume shared with worker.py on other hosts
+storage = StorageManager(os.path.join(DOWNLOAD_DIR, "storage.sqlite3"), STORAGE_BUDGET_BYTES)
+
+def remove_stored_path(path):
+    """Delete an indexed file or directory along with an artifact's cache record and lock"""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+    name = os.path.basename(path)
+    if name.startswith("artifact_"):
+        stem = os.path.splitext(path)[0]
+        if os.path.exists(f"{stem}.json"):
+            os.remove(f"{stem}.json")
+        remove_idle_lock(f"{stem}.lock")
+    logger.info(f"Cleaned up {path}")
+
+def remove_idle_lock(path):
+    """Delete a lock file unless someone holds it; holders re-check it (see ArtifactCache.single_flight)"""
+    try:
+        lock_file = open(path, "r")
+    except FileNotFoundError:
+        return
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # A download is in flight; it keeps or removes the lock when it finishes
+        try:
+            # Only unlink the file we locked, not one a new download created after we opened ours
+            if os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def create_session_dir(session_id, category="session"):
+    """Create and index a working directory for one download"""
+    session_dir = os.path.join(DOWNLOAD_DIR, session_id)
+    os.makedirs(session_dir, exist_ok=True)
+    storage.register(session_dir, category)
+    return session_dir
+
+def remove_session_dir(session_dir):
+    shutil.rmtree(session_dir, ignore_errors=True)
+    storage.unregister(session_dir)
+
+class ResumeState:
+    """Files already finished in a resumable session directory"""
+    filename = "resume.json"
+    
+    def __init__(self, session_dir):
+        self.path = os.path.join(session_dir, self.filename)
+        self._lock = Lock()
+        try:
+            with open(self.path) as f:
+                self.finished = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.finished = {}
+    
+    def files(self, item_id):
+        """Files recorded for an item, or None unless all of them are still on disk"""
+        files = self.finished.get(item_id)
+        if files and all(os.path.isfile(path) for path in files):
+            return files
+        return None
+    
+    def record(self, item_id, files):
+        # Rewritten atomically and synced, so a worker killed mid-download keeps what it finished on record
+        with self._lock:
+            self.finished[item_id] = files
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.finished, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+class CountedFileBody:
+    """Body of a file response that counts the bytes the server takes from it"""
+    # Iterated in Python rather than sendfile()'d, as sendfile() leaves no record of how much went out
+    def __init__(self, body, on_close):
+        self._body = body
+        self._chunks = iter(body)
+        self._on_close = on_close
+        self.sent = 0
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        chunk = next(self._chunks)
+        self.sent += len(chunk)
+        return chunk
+    
+    def close(self):
+        try:
+            if hasattr(self._body, "close"):
+                self._body.close()
+        finally:
+            self._on_close(self.sent)
+
+def send_download(path, download_name, pin=None):
+    """send_file for a stored download, pinned (or keeping the given pin) until the response is closed"""
+    storage.touch(path)
+    token = pin or storage.pin(path)
     try:
-        with YoutubeDL({"quiet": True, "skip_download": True}) as ydl:
-            ydl.extract_info(url, download=False)
+        response = send_file(path, as_attachment=True, download_name=download_name)
+    except Exception:
+        storage.unpin(token)
+        raise
+    started = time.monotonic()
+    
+    def release(sent):
+        storage.unpin(token)
+        metrics.observe("stage_duration_seconds", time.monotonic() - started, stage="send")
+        # Bytes actually sent, so aborted and ranged transfers count what they moved
+        metrics.inc("bytes_served_total", sent)
+    
+    # File responses are direct passthrough, so werkzeug never runs call_on_close
+    # for them; the server closes the body instead.
+    response.response = CountedFileBody(response.response, release)
+    return response
+
+class Metrics(SQLiteStore):
+    """Counters, gauges and per-stage latency histograms, aggregated across workers"""
+    schema = (
+        "CREATE TABLE IF NOT EXISTS processes (process TEXT PRIMARY KEY, data TEXT, updated_at REAL)",
+    )
+    retired = "retired"
+    
+    def __init__(self, path):
+        super().__init__(path)
+        self._lock = Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._flusher = None
+        self._process = None
+    
+    def _ensure_flusher(self):
+        """Start the publishing thread lazily so it is created after gunicorn forks"""
+        if self._flusher is not None and self._process == os.getpid():
+            return
+        with self._lock:
+            if self._flusher is not None and self._process == os.getpid():
+                return
+            if self._process is not None:
+                # Forked from a process that had already recorded metrics
+                self._counters, self._gauges, self._histograms = {}, {}, {}
+            self._process = os.getpid()
+            self._process_key = f"{socket.gethostname()}-{os.getpid()}-{time.time():.0f}"
+            self._flusher = Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flusher.start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            self.flush()
+    
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+    
+    def inc(self, name, amount=1, **labels):
+        self._ensure_flusher()
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+    
+    def add_gauge(self, name, amount, **labels):
+        self._ensure_flusher()
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+    
+    def observe(self, name, value, **labels):
+        self._ensure_flusher()
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(METRICS_BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(METRICS_BUCKETS):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+    
+    @contextmanager
+    def stage(self, name):
+        """Time a block of work as one pipeline stage"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe("stage_duration_seconds", time.monotonic() - start, stage=name)
+    
+    @contextmanager
+    def active(self, name, **labels):
+        """Count a block of work in a gauge while it runs"""
+        self.add_gauge(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add_gauge(name, -1, **labels)
+    
+    @staticmethod
+    def _encode(counters, gauges, histograms):
+        return json.dumps({
+            "counters": [[name, dict(labels), value] for (name, labels), value in counters.items()],
+            "gauges": [[name, dict(labels), value] for (name, labels), value in gauges.items()],
+            "histograms": [[name, dict(labels), value] for (name, labels), value in histograms.items()]
+        })
+    
+    def _sum(self, snapshots):
+        """Add up (data, include_gauges) snapshots"""
+        counters, gauges, histograms = {}, {}, {}
+        for data, include_gauges in snapshots:
+            data = json.loads(data)
+            for name, labels, value in data["counters"]:
+                key = self._key(name, labels)
+                counters[key] = counters.get(key, 0) + value
+            if include_gauges:
+                for name, labels, value in data["gauges"]:
+                    key = self._key(name, labels)
+                    gauges[key] = gauges.get(key, 0) + value
+            for name, labels, value in data["histograms"]:
+                key = self._key(name, labels)
+                if key in histograms:
+                    histograms[key] = [a + b for a, b in zip(histograms[key], value)]
+                else:
+                    histograms[key] = list(value)
+        return counters, gauges, histograms
+    
+    def _exited(self, process, updated_at, now):
+        """Whether a snapshot was left by a process that is gone"""
+        if process == self.retired or now - updated_at <= METRICS_STALE_AFTER:
+            return False
+        host, pid, _ = process.rsplit("-", 2)
+        if host != socket.gethostname():
+            # Another container on this host; its pids are not visible here, and a live one would have flushed
             return True
-    except Exception as e:
-        logger.error(f"Video availability check failed: {str(e)}")
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
         return False
+    
+    def _retire_exited(self, conn):
+        """Fold the counters and histograms of exited processes into the retired row"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            rows = conn.execute("SELECT process, data, updated_at FROM processes").fetchall()
+            exited = [process for process, _, updated_at in rows if self._exited(process, updated_at, now)]
+            if exited:
+                folded = [(data, False) for process, data, _ in rows if process in exited or process == self.retired]
+                conn.executemany("DELETE FROM processes WHERE process = ?", [(process,) for process in exited])
+                conn.execute(
+                    "INSERT OR REPLACE INTO processes VALUES (?, ?, ?)",
+                    (self.retired, self._encode(*self._sum(folded)), now)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def flush(self):
+        """Publish this process's totals"""
+        if self._process is None:
+            return
+        with self._lock:
+            data = self._encode(self._counters, self._gauges, self._histograms)
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO processes VALUES (?, ?, ?)", (self._process_key, data, time.time())
+            )
+        except Exception as e:
+            logger.error(f"Error publishing metrics: {str(e)}")
+    
+    def collect(self):
+        """Sum the published snapshots of every process"""
+        self.flush()
+        conn = self._connect()
+        try:
+            self._retire_exited(conn)
+        except Exception as e:
+            logger.error(f"Error folding metrics of exited processes: {str(e)}")
+        now = time.time()
+        return self._sum(
+            (data, now - updated_at <= METRICS_STALE_AFTER)
+            for data, updated_at in conn.execute("SELECT data, updated_at FROM processes")
+        )
+
+metrics = Metrics(os.path.join(CACHE_DIR, "metrics.sqlite3"))
+
+METRIC_HELP = {
+    "stage_duration_seconds": ("histogram", "Time spent in each pipeline stage"),
+    "rate_limited_total": ("counter", "HTTP 429 responses received from YouTube"),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "bytes_served_total": ("counter", "Bytes of downloads sent to clients"),
+    "downloads_total": ("counter", "Downloads finished by result"),
+    "active_downloads": ("gauge", "Downloads currently running"),
+    "active_jobs": ("gauge", "Queued download jobs currently running"),
+    "job_queue_depth": ("gauge", "Download jobs waiting for a worker"),
+    "job_queue_capacity": ("gauge", "Maximum download jobs waiting"),
+    "schedule_rejected_total": ("counter", "Requests refused because no extraction endpoint was ready in time"),
+    "postprocess_active": ("gauge", "FFmpeg post-processing steps holding a slot"),
+    "postprocess_waiting": ("gauge", "FFmpeg post-processing steps waiting for a slot"),
+    "extraction_tokens": ("gauge", "Tokens left in each extraction endpoint's bucket"),
+    "extraction_backoff_seconds": ("gauge", "Seconds until each extraction endpoint's 429 backoff ends"),
+    "asgi_active_requests": ("gauge", "Requests running in each ASGI work class"),
+    "asgi_queued_requests": ("gauge", "Requests waiting for a slot in each ASGI work class"),
+    "asgi_rejected_total": ("counter", "Requests turned away because their ASGI work class was full")
+}
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    counters, gauges, histograms = metrics.collect()
+    
+    def label_text(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+    
+    cache_stats = metadata_cache.stats()
+    counters[("cache_requests_total", (("cache", "metadata"), ("result", "hit")))] = cache_stats["hits"]
+    counters[("cache_requests_total", (("cache", "metadata"), ("result", "miss")))] = cache_stats["misses"]
+    # Scheduler and job queue state is already shared, so it is read once rather than summed over workers
+    for endpoint in scheduler.stats():
+        labels = (("endpoint", endpoint["id"]),)
+        gauges[("extraction_tokens", labels)] = endpoint["tokens"]
+        gauges[("extraction_backoff_seconds", labels)] = endpoint["backoff_seconds"]
+    gauges[("job_queue_depth", ())] = job_queue.queue_depth()
+    gauges[("job_queue_capacity", ())] = job_queue.max_queued
+    
+    lines = []
+    for series in (counters, gauges, histograms):
+        for name in sorted({name for name, _ in series}):
+            kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP ytdl_{name} {help_text}")
+            lines.append(f"# TYPE ytdl_{name} {kind}")
+            for (metric, labels), value in sorted(series.items()):
+                if metric != name:
+                    continue
+                if series is histograms:
+                    cumulative = value[:len(METRICS_BUCKETS)]
+                    for bound, count in zip(METRICS_BUCKETS, cumulative):
+                        lines.append(f"ytdl_{name}_bucket{label_text(labels, [('le', bound)])} {count}")
+                    lines.append(f"ytdl_{name}_bucket{label_text(labels, [('le', '+Inf')])} {value[-1]}")
+                    lines.append(f"ytdl_{name}_sum{label_text(labels)} {value[-2]}")
+                    lines.append(f"ytdl_{name}_count{label_text(labels)} {value[-1]}")
+                else:
+                    lines.append(f"ytdl_{name}{label_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+class ExtractionScheduler(SQLiteStore):
+    """Rate limiter for requests to YouTube, shared by every worker process"""
+    schema = (
+        "CREATE TABLE IF NOT EXISTS endpoints ("
+        "id TEXT PRIMARY KEY, tokens REAL, updated_at REAL, "
+        "backoff_until REAL, backoff_level INTEGER)",
+    )
+    
+    def __init__(self, path, proxies, cookie_files, rate, burst, bulk_reserve):
+        super().__init__(path)
+        self.rate = rate
+        self.burst = max(burst, bulk_reserve + 1)
+        self.bulk_reserve = bulk_reserve
+        self.endpoints = {}
+        for i in range(max(len(proxies), len(cookie_files))):
+            proxy, cookie_file = proxies[i % len(proxies)], cookie_files[i % len(cookie_files)]
+            options = {"proxy": proxy}
+            if cookie_file:
+                options["cookiefile"] = cookie_file
+            # Stable across processes, and keeps proxy credentials out of logs and metrics
+            endpoint_id = hashlib.sha1(f"{proxy}|{cookie_file}".encode("utf-8")).hexdigest()[:12]
+            self.endpoints[endpoint_id] = {"id": endpoint_id, "options": options}
+    
+    def _try_acquire(self, priority, endpoint_id, cost):
+        """Take tokens from the endpoint that is ready soonest; returns (endpoint, seconds to wait)"""
+        now = time.time()
+        reserve = self.bulk_reserve if priority == "bulk" else 0
+        candidates = [endpoint_id] if endpoint_id in self.endpoints else list(self.endpoints)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO endpoints VALUES (?, ?, ?, 0, 0)",
+                [(candidate, self.burst, now) for candidate in candidates]
+            )
+            best = None
+            for row_id, tokens, updated_at, backoff_until in conn.execute(
+                f"SELECT id, tokens, updated_at, backoff_until FROM endpoints "
+                f"WHERE id IN ({','.join('?' * len(candidates))})", candidates
+            ):
+                tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+                missing = cost + reserve - tokens if cost else 0
+                wait = max(backoff_until - now, missing / self.rate if missing > 0 else 0)
+                # Among ready endpoints, spread load to the one with the most tokens left
+                if best is None or (wait, -tokens) < (best[1], -best[2]):
+                    best = (row_id, wait, tokens)
+            
+            row_id, wait, tokens = best
+            if wait <= 0 and cost:
+                conn.execute(
+                    "UPDATE endpoints SET tokens = ?, updated_at = ? WHERE id = ?",
+                    (tokens - cost, now, row_id)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.endpoints[row_id], wait
+    
+    def acquire(self, priority="interactive", endpoint_id=None, cost=1, max_wait=None):
+        """Wait for a token and return the endpoint to use"""
+        start = time.monotonic()
+        deadline = start + (EXTRACT_MAX_WAIT[priority] if max_wait is None else max_wait)
+        while True:
+            endpoint, wait = self._try_acquire(priority, endpoint_id, cost)
+            if wait <= 0:
+                metrics.observe("stage_duration_seconds", time.monotonic() - start, stage=f"schedule_{priority}")
+                return endpoint
+            if time.monotonic() + wait > deadline:
+                metrics.inc("schedule_rejected_total", priority=priority)
+                raise DownloadError("YouTube is rate limiting requests. Please try again later.", 429)
+            # Poll rather than sleep it out so backoff set by other workers is noticed
+            time.sleep(min(wait, 1.0) * random.uniform(0.5, 1.0))
+    
+    def charge(self, endpoint, cost):
+        """Take tokens for requests an extraction has already made, e.g. one per playlist entry"""
+        if cost <= 0:
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Tokens may go negative, so later requests wait until the bucket has paid for the burst
+            conn.execute(
+                "UPDATE endpoints SET tokens = MIN(?, tokens + (? - updated_at) * ?) - ?, updated_at = ? WHERE id = ?",
+                (self.burst, now, self.rate, cost, now, endpoint["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def report(self, endpoint, rate_limited):
+        """Back an endpoint off after a 429, or relax its backoff after a success"""
+        now = time.time()
+        conn = self._connect()
+        if rate_limited:
+            metrics.inc("rate_limited_total")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                level, backoff_until = conn.execute(
+                    "SELECT backoff_level, backoff_until FROM endpoints WHERE id = ?", (endpoint["id"],)
+                ).fetchone()
+                # Requests already in flight when the backoff started don't escalate it further
+                if backoff_until <= now:
+                    delay = min(EXTRACT_BACKOFF_BASE * 2 ** level, EXTRACT_BACKOFF_MAX) * random.uniform(0.8, 1.2)
+                    conn.execute(
+                        "UPDATE endpoints SET backoff_until = ?, backoff_level = ?, tokens = 0, updated_at = ? WHERE id = ?",
+                        (now + delay, level + 1, now, endpoint["id"])
+                    )
+                    logger.warning(f"Rate limited through endpoint {endpoint['id']}, backing off for {delay:.0f}s")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        else:
+            conn.execute(
+                "UPDATE endpoints SET backoff_level = backoff_level - 1 "
+                "WHERE id = ? AND backoff_level > 0 AND backoff_until <= ?", (endpoint["id"], now)
+            )
+    
+    @contextmanager
+    def slot(self, priority="interactive", endpoint_id=None, cost=1, max_wait=None):
+        """Run one YouTube request through the scheduler, yielding its endpoint"""
+        endpoint = self.acquire(priority, endpoint_id, cost, max_wait)
+        try:
+            yield endpoint
+        except Exception as e:
+            if is_rate_limited(e) and not isinstance(e, DownloadError):
+                self.report(endpoint, rate_limited=True)
+            raise
+        else:
+            self.report(endpoint, rate_limited=False)
+    
+    def retry_after(self):
+        """Whole seconds until the soonest endpoint is out of backoff, for Retry-After headers"""
+        return max(1, math.ceil(min((endpoint["backoff_seconds"] for endpoint in self.stats()), default=0)))
+    
+    def stats(self):
+        now = time.time()
+        return [
+            {
+                "id": row_id,
+                "tokens": round(min(self.burst, tokens + (now - updated_at) * self.rate), 2),
+                "backoff_seconds": round(max(backoff_until - now, 0), 1),
+                "backoff_level": level
+            }
+            for row_id, tokens, updated_at, backoff_until, level in self._connect().execute(
+                "SELECT id, tokens, updated_at, backoff_until, backoff_level FROM endpoints"
+            )
+            if row_id in self.endpoints
+        ]
+
+scheduler = ExtractionScheduler(
+    os.path.join(CACHE_DIR, "scheduler.sqlite3"),
+    EXTRACT_PROXIES, EXTRACT_COOKIE_FILES, EXTRACT_RATE, EXTRACT_BURST, EXTRACT_BULK_RESERVE
+)
+
+class YoutubeDLPool:
+    """Per-process pool of warmed-up YoutubeDL instances for metadata extraction"""
+    def __init__(self, max_idle, max_uses):
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self._idle = {}
+        self._lock = Lock()
+        self._process = os.getpid()
+    
+    def _build(self, endpoint):
+        opts = downloader.get_info_opts()
+        if endpoint:
+            opts.update(endpoint["options"])
+        return YoutubeDL(opts)
+    
+    def _idle_list(self, pool_key):
+        """Idle instances for pool_key; call with the lock held"""
+        if self._process != os.getpid():
+            # Instances built before fork() share sockets with the parent
+            self._idle, self._process = {}, os.getpid()
+        return self._idle.setdefault(pool_key, [])
+    
+    def _take(self, pool_key):
+        with self._lock:
+            idle = self._idle_list(pool_key)
+            return idle.pop() if idle else None
+    
+    def _give_back(self, pool_key, ydl, uses):
+        with self._lock:
+            idle = self._idle_list(pool_key)
+            if uses < self.max_uses and len(idle) < self.max_idle:
+                idle.append((ydl, uses))
+                return
+        ydl.close()
+    
+    # Read once, when an instance sets up its cookie jar and request director, so a reused one ignores changes
+    fixed_params = frozenset({"proxy", "http_headers", "cookiefile", "source_address", "nocheckcertificate"})
+    
+    @contextmanager
+    def borrow(self, endpoint=None, **params):
+        """Lend an instance for endpoint with extraction params overridden for the duration"""
+        fixed = self.fixed_params & params.keys()
+        if fixed:
+            raise ValueError(f"Pooled YoutubeDL instances cannot override {', '.join(sorted(fixed))}")
+        pool_key = endpoint["id"] if endpoint else None
+        pooled = self._take(pool_key)
+        metrics.inc("cache_requests_total", cache="ydl_pool", result="hit" if pooled else "miss")
+        ydl, uses = pooled or (self._build(endpoint), 0)
+        
+        missing = object()
+        saved = {key: ydl.params.get(key, missing) for key in params}
+        ydl.params.update(params)
+        try:
+            yield ydl
+        except BaseException:
+            # An instance that failed mid-request may hold half-finished state
+            ydl.close()
+            raise
+        else:
+            for key, value in saved.items():
+                if value is missing:
+                    ydl.params.pop(key, None)
+                else:
+                    ydl.params[key] = value
+            self._give_back(pool_key, ydl, uses + 1)
+    
+    def prefill(self, count):
+        """Build instances ahead of the first requests, e.g. right after a worker forks"""
+        for endpoint in scheduler.endpoints.values():
+            for _ in range(count):
+                self._give_back(endpoint["id"], self._build(endpoint), 0)
+    
+    def stats(self):
+        with self._lock:
+            self._idle_list(None)  # Drops instances inherited across fork()
+            return {
+                "idle": sum(len(idle) for idle in self._idle.values()),
+                "max_idle": self.max_idle,
+                "max_uses": self.max_uses
+            }
+
+ydl_pool = YoutubeDLPool(YDL_POOL_MAX_IDLE, YDL_POOL_MAX_USES)
+
+def warm_up():
+    """Import the YouTube extractors before serving"""
+    with YoutubeDL(downloader.get_info_opts()) as ydl:
+        for ie_key in ("Youtube", "YoutubeTab"):
+            ydl.get_info_extractor(ie_key)
+
+def earliest_url_expiry(info):
+    """Find the earliest signed `expire` timestamp among the format URLs"""
+    expiries = []
+    for item in [info] + [e for e in info.get("entries") or [] if e]:
+        for f in item.get("formats") or []:
+            match = re.search(r'[?&/]expire[=/](\d+)', f.get("url") or "")
+            if match:
+                expiries.append(int(match.group(1)))
+    return min(expiries) if expiries else None
+
+EXTRACTION_ENDPOINT_KEY = "_extraction_endpoint"
+# Top-level fields yt-dlp fills in from the format it picked while extracting
+SELECTED_FORMAT_FIELDS = frozenset(getattr(YoutubeDL, "_format_fields", ())) | {
+    "requested_formats", "requested_downloads", "requested_subtitles"
+}
+
+def clear_format_selection(info):
+    """Drop the format choice made during extraction from an info dict and its entries"""
+    for item in [info] + [e for e in info.get("entries") or [] if e]:
+        if item.get("formats"):
+            for field in SELECTED_FORMAT_FIELDS & item.keys():
+                del item[field]
+    return info
+
+def metadata_cache_key(url):
+    """Cache key for a URL: playlist id if yt-dlp will extract a playlist, else video id"""
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    query = parse_qs(parsed.query)
+    if query.get("list"):
+        return f"playlist:{query['list'][0]}"
+    if query.get("v"):
+        return f"video:{query['v'][0][:11]}"
+    if parsed.netloc.endswith("youtu.be"):
+        return f"video:{parsed.path.lstrip('/')[:11]}"
+    return None
+
+def extract_info_cached(url, priority="interactive", max_wait=None):
+    """extract_info(download=False) through the shared metadata cache"""
+    key = metadata_cache_key(url)
+    if key:
+        info = metadata_cache.get(key)
+        if info is not None:
+            # Entries cached before selections were cleared still carry one
+            return clear_format_selection(info)
+    
+    with scheduler.slot(priority, max_wait=max_wait) as endpoint:
+        with metrics.stage("extract"), ydl_pool.borrow(endpoint) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+    if info and info.get("_type") == "playlist":
+        # A full playlist extraction requested every entry as well as the playlist itself
+        scheduler.charge(endpoint, len([entry for entry in info.get("entries") or [] if entry]))
+    clear_format_selection(info)
+    info[EXTRACTION_ENDPOINT_KEY] = endpoint["id"]
+    
+    if key and info:
+        metadata_cache.set(key, info)
+    return info
 
 @app.route("/api/health", methods=["GET"])
 def health_check():
@@ -302,6 +1533,159 @@ def health_check():
         "version": "2.1"
     })
 
+def extraction_error(e):
+    """Map a yt-dlp extraction error to (message, status code), or None if unrecognised"""
+    if is_rate_limited(e):
+        return "YouTube is rate limiting requests. Please try again later.", 429
+    elif "Private video" in str(e):
+        return "This is a private video and cannot be accessed", 403
+    elif "Unavailable" in str(e):
+        return "Video is unavailable", 404
+    return None
+
+def extraction_error_response(e):
+    """Map a yt-dlp extraction error to an error response, or None if unrecognised"""
+    error = extraction_error(e)
+    if error:
+        headers = {"Retry-After": str(scheduler.retry_after())} if error[1] == 429 else {}
+        return jsonify({"error": error[0]}), error[1], headers
+    return None
+
+def iter_flat_playlist(url, offset, limit):
+    """Yield the playlist header, then up to `limit` flat entries from `offset`"""
+    key = metadata_cache_key(url)
+    page_key = f"{key}:flat:{offset}:{limit}" if key else None
+    cached = metadata_cache.get(page_key) if page_key else None
+    if cached is not None:
+        yield cached["header"]
+        yield from cached["entries"]
+        return
+    
+    with scheduler.slot("interactive") as endpoint, metrics.stage("extract_flat"), \
+            ydl_pool.borrow(endpoint, extract_flat="in_playlist", lazy_playlist=True) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+        # watch?v=...&list=... resolves to a reference to the playlist itself
+        if info.get("_type") in ("url", "url_transparent"):
+            info = ydl.extract_info(info["url"], download=False, process=False)
+        
+        header = {
+            "type": "playlist",
+            "id": info.get("id"),
+            "title": info.get("title", "Unknown Playlist"),
+            "description": info.get("description", ""),
+            "uploader": info.get("uploader") or info.get("channel") or "Unknown",
+            "total_entries": info.get("playlist_count"),
+            "offset": offset,
+            "limit": limit
+        }
+        yield header
+        
+        entries = []
+        for entry in itertools.islice(info.get("entries") or [], offset, offset + limit):
+            if not entry:
+                continue
+            entry = ydl.sanitize_info(entry)
+            entries.append(entry)
+            yield entry
+    # The slot paid for the first page; entries past it took one more request per page
+    scheduler.charge(endpoint, math.ceil((offset + len(entries)) / YOUTUBE_PLAYLIST_PAGE_ENTRIES) - 1)
+    
+    if page_key:
+        metadata_cache.set(page_key, {"header": header, "entries": entries})
+
+def flat_entry_response(entry, audio_only=False):
+    """Public view of a flat playlist entry; qualities are resolved on demand"""
+    video_id = entry.get("id")
+    return {
+        "id": video_id,
+        "title": entry.get("title", "Unknown Title"),
+        "duration": format_duration(int(entry["duration"]) if entry.get("duration") else None),
+        "duration_seconds": entry.get("duration"),
+        "channel": entry.get("uploader") or entry.get("channel") or "Unknown Channel",
+        "thumbnail": f"/api/thumbnail/{video_id}" if video_id else None,
+        "available_qualities": None,
+        "qualities_url": f"/api/qualities/{video_id}?audio_only={int(bool(audio_only))}" if video_id else None,
+        "view_count": entry.get("view_count"),
+        "upload_date": entry.get("upload_date")
+    }
+
+def parse_page_params(data):
+    """Read offset/limit pagination from a request body"""
+    offset = data.get("offset", 0)
+    limit = data.get("limit", PLAYLIST_PAGE_SIZE)
+    for value in (offset, limit):
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError("offset and limit must be non-negative integers")
+    if not 1 <= limit <= PLAYLIST_PAGE_MAX:
+        raise ValueError(f"limit must be between 1 and {PLAYLIST_PAGE_MAX}")
+    return offset, limit
+
+def encode_stream_event(stream_format, event, payload):
+    """One event of an NDJSON or SSE response"""
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"event": event, **payload}) + "\n"
+
+def flat_playlist_response(url, data, audio_only):
+    """Paginated flat playlist listing, as JSON or streamed as NDJSON/SSE"""
+    try:
+        offset, limit = parse_page_params(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    stream_format = data.get("stream")
+    if stream_format not in (None, False, "ndjson", "sse"):
+        return jsonify({"error": "Invalid stream format. Supported: ndjson, sse"}), 400
+    
+    items = iter_flat_playlist(url, offset, limit)
+    try:
+        # Pull the header now so extraction errors still get a proper status
+        header = next(items)
+    except Exception as e:
+        error_response = extraction_error_response(e)
+        if error_response:
+            return error_response
+        raise
+    
+    if not stream_format:
+        try:
+            # Later pages are fetched lazily, so errors can also surface here
+            videos = [flat_entry_response(entry, audio_only) for entry in items]
+        except Exception as e:
+            error_response = extraction_error_response(e)
+            if error_response:
+                return error_response
+            raise
+        header.update({
+            "video_count": len(videos),
+            "next_offset": offset + limit if len(videos) == limit else None,
+            "videos": videos
+        })
+        return jsonify(header)
+    
+    def encode(event, payload):
+        return encode_stream_event(stream_format, event, payload)
+    
+    def generate():
+        yield encode("playlist", header)
+        count = 0
+        try:
+            for entry in items:
+                count += 1
+                yield encode("entry", flat_entry_response(entry, audio_only))
+        except Exception as e:
+            logger.error(f"Error streaming playlist {header.get('id')}: {str(e)}")
+            error = extraction_error(e)
+            if error and error[1] == 429:
+                yield encode("error", {"error": error[0], "status_code": 429, "retry_after": scheduler.retry_after()})
+            else:
+                yield encode("error", {"error": str(e)})
+            return
+        yield encode("end", {"video_count": count, "next_offset": offset + limit if count == limit else None})
+    
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/api/info", methods=["POST"])
 def get_video_info():
     """Get video or playlist information"""
@@ -318,188 +1702,1597 @@ def get_video_info():
         if not is_valid:
             return jsonify({"error": message}), 400
         
-        is_video = re.match(VIDEO_REGEX, url)
-        is_playlist = re.match(PLAYLIST_REGEX, url)
+        if data.get("flat") or data.get("stream"):
+            if (metadata_cache_key(url) or "").startswith("playlist:"):
+                return flat_playlist_response(url, data, audio_only)
         
-        ydl_opts = downloader.get_info_opts()
+        try:
+            info = extract_info_cached(url)
+        except Exception as e:
+            error_response = extraction_error_response(e)
+            if error_response:
+                return error_response
+            raise
         
-        with YoutubeDL(ydl_opts) as ydl:
-            try:
-                info = ydl.extract_info(url, download=False)
-            except Exception as e:
-                if "HTTP Error 429" in str(e):
-                    return jsonify({"error": "YouTube is rate limiting requests. Please try again later."}), 429
-                elif "Private video" in str(e):
-                    return jsonify({"error": "This is a private video and cannot be accessed"}), 403
-                elif "Unavailable" in str(e):
-                    return jsonify({"error": "Video is unavailable"}), 404
-                raise
-            
-            if is_playlist or ("entries" in info and info.get("_type") == "playlist"):
-                videos = []
-                processed_count = 0
-                
-                for entry in info.get("entries", []):
-                    if entry is None:
-                        continue
-                    
-                    processed_count += 1
-                    if processed_count > 100:  # Limit playlist size
-                        break
-                    
-                    save_thumbnail(entry)
-                    qualities = get_available_qualities(entry, audio_only)
-                    
-                    videos.append({
-                        "id": entry.get("id"),
-                        "title": entry.get("title", "Unknown Title"),
-                        "duration": format_duration(entry.get("duration")),
-                        "duration_seconds": entry.get("duration"),
-                        "channel": entry.get("uploader", "Unknown Channel"),
-                        "thumbnail": f"/api/thumbnail/{entry.get('id')}" if entry.get('id') else None,
-                        "available_qualities": qualities,
-                        "view_count": entry.get("view_count"),
-                        "upload_date": entry.get("upload_date")
-                    })
-                
-                return jsonify({
-                    "type": "playlist",
-                    "title": info.get("title", "Unknown Playlist"),
-                    "description": info.get("description", ""),
-                    "uploader": info.get("uploader", "Unknown"),
-                    "video_count": len(videos),
-                    "total_entries": info.get("playlist_count", len(videos)),
-                    "videos": videos
-                })
-            
-            elif is_video:
-                save_thumbnail(info)
-                qualities = get_available_qualities(info, audio_only)
-                
-                return jsonify({
-                    "type": "video",
-                    "id": info.get("id"),
-                    "title": info.get("title", "Unknown Title"),
-                    "description": info.get("description", ""),
-                    "duration": format_duration(info.get("duration")),
-                    "duration_seconds": info.get("duration"),
-                    "channel": info.get("uploader", "Unknown Channel"),
-                    "view_count": info.get("view_count"),
-                    "like_count": info.get("like_count"),
-                    "upload_date": info.get("upload_date"),
-                    "thumbnail": f"/api/thumbnail/{info.get('id')}" if info.get('id') else None,
-                    "available_qualities": qualities
-                })
-            
-        return jsonify({"error": "Invalid URL type"}), 400
+        body = video_info_response(url, info, audio_only)
+        if body is None:
+            return jsonify({"error": "Invalid URL type"}), 400
+        return jsonify(body)
         
     except Exception as e:
         logger.error(f"Error in get_video_info: {str(e)}")
         return jsonify({"error": f"Failed to extract video information: {str(e)}"}), 500
 
-@app.route("/api/download", methods=["POST"])
-def download_video():
-    """Download video or playlist (video or audio)"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
+def video_info_response(url, info, audio_only=False):
+    """Public view of an extracted video or playlist, or None if the URL is neither"""
+    if re.match(PLAYLIST_REGEX, url) or ("entries" in info and info.get("_type") == "playlist"):
+        videos = []
+        processed_count = 0
         
-        url = data.get("url", "").strip()
-        format_type = data.get("format", "mp4").lower()
-        quality = data.get("quality", "720")
-        audio_only = data.get("audio_only", False)
+        for entry in info.get("entries", []):
+            if entry is None:
+                continue
+            
+            processed_count += 1
+            if processed_count > 100:  # Limit playlist size
+                break
+            
+            schedule_thumbnail(entry)
+            qualities = get_available_qualities(entry, audio_only)
+            
+            videos.append({
+                "id": entry.get("id"),
+                "title": entry.get("title", "Unknown Title"),
+                "duration": format_duration(entry.get("duration")),
+                "duration_seconds": entry.get("duration"),
+                "channel": entry.get("uploader", "Unknown Channel"),
+                "thumbnail": f"/api/thumbnail/{entry.get('id')}" if entry.get('id') else None,
+                "available_qualities": qualities,
+                "view_count": entry.get("view_count"),
+                "upload_date": entry.get("upload_date")
+            })
         
-        # Validate inputs
-        is_valid, message = validate_url(url)
-        if not is_valid:
-            return jsonify({"error": message}), 400
+        return {
+            "type": "playlist",
+            "title": info.get("title", "Unknown Playlist"),
+            "description": info.get("description", ""),
+            "uploader": info.get("uploader", "Unknown"),
+            "video_count": len(videos),
+            "total_entries": info.get("playlist_count", len(videos)),
+            "videos": videos
+        }
+    
+    elif re.match(VIDEO_REGEX, url):
+        schedule_thumbnail(info)
+        qualities = get_available_qualities(info, audio_only)
         
-        if audio_only:
-            if format_type not in ["mp3", "aac", "m4a", "wav", "opus"]:
-                return jsonify({"error": "Invalid audio format. Supported: mp3, aac, m4a, wav, opus"}), 400
-        else:
-            if format_type not in ["mp4", "webm", "mkv"]:
-                return jsonify({"error": "Invalid format. Supported: mp4, webm, mkv"}), 400
+        return {
+            "type": "video",
+            "id": info.get("id"),
+            "title": info.get("title", "Unknown Title"),
+            "description": info.get("description", ""),
+            "duration": format_duration(info.get("duration")),
+            "duration_seconds": info.get("duration"),
+            "channel": info.get("uploader", "Unknown Channel"),
+            "view_count": info.get("view_count"),
+            "like_count": info.get("like_count"),
+            "upload_date": info.get("upload_date"),
+            "thumbnail": f"/api/thumbnail/{info.get('id')}" if info.get('id') else None,
+            "available_qualities": qualities
+        }
+    
+    return None
+
+# Caps batch extractions across every batch request running in this process
+info_batch_slots = BoundedSemaphore(INFO_BATCH_CONCURRENCY)
+
+def batch_info_item(url, audio_only):
+    """Extract one validated URL of a batch into a result body or a per-item error"""
+    with info_batch_slots:
+        try:
+            # Bulk tokens, but a synchronous batch gives up on an item quickly with a per-item 429
+            info = extract_info_cached(url, priority="bulk", max_wait=INFO_BATCH_MAX_WAIT)
+        except Exception as e:
+            error = extraction_error(e)
+            if not error:
+                logger.error(f"Error in batch extraction of {url}: {str(e)}")
+                error = (f"Failed to extract video information: {str(e)}", 500)
+            return {"status": "error", "error": error[0], "status_code": error[1]}
+    
+    body = video_info_response(url, info, audio_only)
+    if body is None:
+        return {"status": "error", "error": "Invalid URL type", "status_code": 400}
+    return {"status": "ok", "status_code": 200, "info": body}
+
+@app.route("/api/info/batch", methods=["POST"])
+def get_video_info_batch():
+    """Get information for up to INFO_BATCH_MAX_URLS videos or playlists at once"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
         
-        # Check video availability
-        if not is_video_available(url):
-            return jsonify({"error": "Video is unavailable or private"}), 404
+        urls = data.get("urls")
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):
+            return jsonify({"error": "urls must be a non-empty list of URLs"}), 400
+        if len(urls) > INFO_BATCH_MAX_URLS:
+            return jsonify({"error": f"At most {INFO_BATCH_MAX_URLS} URLs per batch"}), 400
         
-        is_playlist = re.match(PLAYLIST_REGEX, url)
+        concurrency = data.get("concurrency", INFO_BATCH_CONCURRENCY)
+        if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+            return jsonify({"error": "Invalid concurrency. Must be a positive integer"}), 400
+        concurrency = min(concurrency, INFO_BATCH_CONCURRENCY)
         
-        # Create session directory
-        session_id = str(uuid.uuid4())
-        session_dir = os.path.join(DOWNLOAD_DIR, session_id)
-        os.makedirs(session_dir, exist_ok=True)
+        stream_format = data.get("stream")
+        if stream_format not in (None, False, "ndjson", "sse"):
+            return jsonify({"error": "Invalid stream format. Supported: ndjson, sse"}), 400
+        audio_only = data.get("audio_only", False)
         
+        # Each URL is validated on its own; valid ones for the same video or playlist share one extraction
+        urls = [url.strip() for url in urls]
+        rejected = {}
+        groups = OrderedDict()
+        for index, url in enumerate(urls):
+            is_valid, message = validate_url(url)
+            if not is_valid:
+                rejected[index] = {"status": "error", "error": message, "status_code": 400}
+                continue
+            groups.setdefault(metadata_cache_key(url) or f"url:{url}", []).append(index)
+        
+    except Exception as e:
+        logger.error(f"Error in get_video_info_batch: {str(e)}")
+        return jsonify({"error": f"Failed to extract video information: {str(e)}"}), 500
+    
+    def run(executor):
+        for index, result in rejected.items():
+            yield dict(result, index=index, url=urls[index])
+        futures = {
+            executor.submit(batch_info_item, urls[indexes[0]], audio_only): indexes
+            for indexes in groups.values()
+        }
+        for future in as_completed(futures):
+            for index in futures[future]:
+                yield dict(future.result(), index=index, url=urls[index])
+    
+    if not stream_format:
+        with ThreadPoolExecutor(max_workers=max(min(concurrency, len(groups)), 1), thread_name_prefix="info-batch") as executor:
+            results = sorted(run(executor), key=lambda result: result["index"])
+        succeeded = sum(1 for result in results if result["status"] == "ok")
+        return jsonify({"count": len(results), "succeeded": succeeded, "failed": len(results) - succeeded, "results": results})
+    
+    def encode(event, payload):
+        return encode_stream_event(stream_format, event, payload)
+    
+    def generate():
+        succeeded = 0
+        with ThreadPoolExecutor(max_workers=max(min(concurrency, len(groups)), 1), thread_name_prefix="info-batch") as executor:
+            try:
+                for result in run(executor):
+                    succeeded += result["status"] == "ok"
+                    yield encode("item", result)
+            except GeneratorExit:
+                # Client went away; don't start extractions nobody will read
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+        yield encode("end", {"count": len(urls), "succeeded": succeeded, "failed": len(urls) - succeeded})
+    
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def parse_download_request(data):
+    """Validate download parameters from a request body"""
+    if not data:
+        raise DownloadError("No JSON data provided", 400)
+    
+    url = data.get("url", "").strip()
+    format_type = data.get("format", "mp4").lower()
+    quality = data.get("quality", "720")
+    audio_only = data.get("audio_only", False)
+    
+    # Validate inputs
+    is_valid, message = validate_url(url)
+    if not is_valid:
+        raise DownloadError(message, 400)
+    
+    if audio_only:
+        if format_type not in ["mp3", "aac", "m4a", "wav", "opus"]:
+            raise DownloadError("Invalid audio format. Supported: mp3, aac, m4a, wav, opus", 400)
+    else:
+        if format_type not in ["mp4", "webm", "mkv"]:
+            raise DownloadError("Invalid format. Supported: mp4, webm, mkv", 400)
+    
+    progress_id = data.get("progress_id")
+    if progress_id is not None and not (isinstance(progress_id, str) and re.match(PROGRESS_ID_REGEX, progress_id)):
+        raise DownloadError("Invalid progress_id. Use 8-64 letters, digits, '-' or '_'", 400)
+    
+    concurrency = data.get("concurrency")
+    if concurrency is not None:
+        if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+            raise DownloadError("Invalid concurrency. Must be a positive integer", 400)
+        concurrency = min(concurrency, PLAYLIST_CONCURRENCY)
+    
+    return {
+        "url": url,
+        "format_type": format_type,
+        "quality": quality,
+        "audio_only": audio_only,
+        "concurrency": concurrency,
+        "progress_id": progress_id
+    }
+
+def load_download_info(url, priority="interactive"):
+    """Extract info for a download and check it is available and within limits"""
+    # Check video availability
+    try:
+        info = extract_info_cached(url, priority=priority)
+    except Exception as e:
+        logger.error(f"Video availability check failed: {str(e)}")
+        if is_rate_limited(e):
+            raise DownloadError("YouTube is rate limiting requests. Please try again later.", 429)
+        raise DownloadError("Video is unavailable or private", 404)
+    
+    return info
+
+class SizeLimitExceeded(DownloadCancelled):
+    """Raised from a progress hook to stop a download that outgrew MAX_FILE_SIZE"""
+
+def select_formats(info, spec):
+    """Formats yt-dlp would download for a video with the given format spec"""
+    with ydl_pool.borrow() as ydl:
+        # The selector is compiled from params["format"] when the instance is built
+        default_selector = ydl.format_selector
+        ydl.format_selector = ydl.build_format_selector(spec)
+        try:
+            # A choice left in info would survive a single-format selection
+            selected = ydl.process_ie_result(clear_format_selection(copy.deepcopy(info)), download=False)
+        finally:
+            ydl.format_selector = default_selector
+    return selected.get("requested_formats") or [selected]
+
+def estimate_format_size(fmt, duration):
+    """Bytes a format will take: exact size, yt-dlp's approximation or bitrate x duration"""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if not size and fmt.get("tbr") and duration:
+        size = fmt["tbr"] * 1000 / 8 * duration
+    return int(size or 0)
+
+def estimate_video_size(info, format_type, quality, audio_only):
+    """Estimated bytes of one video's output, or 0 if nothing is known"""
+    spec = downloader.get_download_opts(format_type, quality, DOWNLOAD_DIR, audio_only, info)["format"]
+    try:
+        formats = select_formats(info, spec)
+    except Exception as e:
+        logger.info(f"Could not estimate size of {info.get('id')}: {str(e)}")
+        return 0
+    duration = info.get("duration")
+    source_size = sum(estimate_format_size(fmt, duration) for fmt in formats)
+    
+    # Transcoded audio is sized by the output bitrate, not the source
+    bitrate = AUDIO_OUTPUT_BITRATES.get(format_type) or (int(quality) if str(quality).isdigit() else 192)
+    if audio_only and not downloader.plan_audio(format_type, quality, info)["copy"] and duration:
+        return int(bitrate * 1000 / 8 * duration)
+    return source_size
+
+def check_download_size(info, format_type, quality, audio_only):
+    """Refuse a download whose estimated size is over MAX_FILE_SIZE before any bytes move"""
+    entries = info.get("entries") if info.get("_type") == "playlist" else [info]
+    total = 0
+    for entry in entries or []:
+        if not entry:
+            continue
+        total += estimate_video_size(entry, format_type, quality, audio_only)
+        if total > MAX_FILE_SIZE:
+            logger.info(f"Rejecting {info.get('id')}: estimated {total} bytes exceeds size limit")
+            raise DownloadError("Estimated download size exceeds size limit", 413)
+    return total
+
+class SizeGuard:
+    """Progress hook that aborts downloads once their bytes pass MAX_FILE_SIZE"""
+    def __init__(self, limit=None):
+        self.limit = limit or MAX_FILE_SIZE
+        self.exceeded = False
+        self._files = {}
+        self._lock = Lock()
+    
+    def hook(self, d):
+        if self.exceeded:
+            raise SizeLimitExceeded("Download exceeds size limit")
+        if d.get("status") not in ("downloading", "finished"):
+            return
+        name = d.get("filename") or d.get("tmpfilename")
+        size = max(d.get("downloaded_bytes") or 0, d.get("total_bytes") or 0)
+        with self._lock:
+            self._files[name] = max(self._files.get(name, 0), size)
+            if sum(self._files.values()) > self.limit:
+                self.exceeded = True
+        if self.exceeded:
+            raise SizeLimitExceeded("Download exceeds size limit")
+
+def is_playlist_info(url, info):
+    return bool(re.match(PLAYLIST_REGEX, url)) or ("entries" in info and info.get("_type") == "playlist")
+
+class ProgressBroker:
+    """Latest progress snapshot per download, fanned out to any number of subscribers"""
+    def __init__(self):
+        self._snapshots = {}
+        self._condition = Condition()
+    
+    def _path(self, progress_id):
+        return os.path.join(JOB_DIR, f"{progress_id}.progress.json")
+    
+    def publish(self, progress_id, snapshot):
+        # Held while writing the mirror file so concurrent entries cannot
+        # replace a newer snapshot with an older one
+        with self._condition:
+            previous = self._snapshots.get(progress_id)
+            snapshot["version"] = (previous["version"] + 1) if previous else 1
+            snapshot["updated_at"] = time.time()
+            self._snapshots[progress_id] = snapshot
+            try:
+                tmp_path = f"{self._path(progress_id)}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self._path(progress_id))
+                if snapshot["version"] == 1:
+                    storage.register(self._path(progress_id), "job")
+            except OSError as e:
+                logger.error(f"Error writing progress for {progress_id}: {str(e)}")
+            if snapshot["status"] in ("finished", "error"):
+                # Late subscribers read the terminal snapshot from disk
+                self._snapshots.pop(progress_id, None)
+            self._condition.notify_all()
+    
+    def snapshot(self, progress_id):
+        snapshot = self._snapshots.get(progress_id)
+        if snapshot is not None:
+            return snapshot
         try:
-            ydl_opts = downloader.get_download_opts(format_type, quality, session_dir, audio_only)
+            with open(self._path(progress_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def subscribe(self, progress_id):
+        """Yield each new snapshot (or None as a heartbeat) until the download ends"""
+        last_version = None
+        last_update = last_yield = time.monotonic()
+        while True:
+            snapshot = self.snapshot(progress_id)
+            now = time.monotonic()
+            if snapshot and snapshot["version"] != last_version:
+                last_version = snapshot["version"]
+                last_update = last_yield = now
+                yield snapshot
+                if snapshot["status"] in ("finished", "error"):
+                    return
+            elif now - last_update > PROGRESS_IDLE_TIMEOUT:
+                return
+            elif now - last_yield > PROGRESS_HEARTBEAT:
+                last_yield = now
+                yield None
+            with self._condition:
+                self._condition.wait(timeout=1)
+
+progress_broker = ProgressBroker()
+
+class DownloadProgress:
+    """yt-dlp progress and post-processor hooks feeding the progress broker"""
+    def __init__(self, progress_id, playlist_count=None):
+        self.progress_id = progress_id
+        self.playlist_count = playlist_count
+        self._items = {}
+        self._completed = 0
+        self._last_publish = 0.0
+        self._lock = Lock()
+    
+    def hooks(self, index=0):
+        """Progress and post-processor hooks for one item (0 for a single video)"""
+        def progress_hook(d):
+            status = d.get("status")
+            if status == "downloading" and time.monotonic() - self._last_publish < PROGRESS_INTERVAL:
+                return
+            self._update(index, {
+                "phase": "download",
+                "status": status,
+                "downloaded_bytes": d.get("downloaded_bytes"),
+                "total_bytes": d.get("total_bytes") or d.get("total_bytes_estimate"),
+                "speed": d.get("speed"),
+                "eta": d.get("eta"),
+                "filename": os.path.basename(d.get("filename") or "")
+            }, force=status != "downloading")
+        
+        def postprocessor_hook(d):
+            self._update(index, {
+                "phase": "postprocess",
+                "postprocessor": d.get("postprocessor"),
+                "status": d.get("status")
+            }, force=True)
+        
+        return progress_hook, postprocessor_hook
+    
+    def item_done(self, index, status="finished", error=None):
+        with self._lock:
+            self._completed += 1
+        self._update(index, {"phase": "done", "status": status, "error": error}, force=True)
+    
+    def _update(self, index, state, force=False):
+        with self._lock:
+            self._items.setdefault(index, {}).update(state)
+            now = time.monotonic()
+            if not force and now - self._last_publish < PROGRESS_INTERVAL:
+                return
+            self._last_publish = now
+            snapshot = self._snapshot("running")
+        progress_broker.publish(self.progress_id, snapshot)
+    
+    def _snapshot(self, status, error=None):
+        return {
+            "id": self.progress_id,
+            "status": status,
+            "error": error,
+            "playlist_count": self.playlist_count,
+            "completed": self._completed,
+            "items": {str(index): dict(state) for index, state in self._items.items()}
+        }
+    
+    def finish(self, error=None):
+        with self._lock:
+            snapshot = self._snapshot("error" if error else "finished", error)
+        progress_broker.publish(self.progress_id, snapshot)
+    
+    def attach(self, ydl_opts, index=0):
+        """Add this tracker's hooks for one item to a set of YoutubeDL options"""
+        progress_hook, postprocessor_hook = self.hooks(index)
+        ydl_opts["progress_hooks"] = ydl_opts.get("progress_hooks", []) + [progress_hook]
+        ydl_opts["postprocessor_hooks"] = ydl_opts.get("postprocessor_hooks", []) + [postprocessor_hook]
+        return ydl_opts
+
+def ffmpeg_postprocessor_names(cls=FFmpegPostProcessor):
+    """Names postprocessor hooks report for every FFmpeg-backed post-processor"""
+    names = set()
+    for subclass in cls.__subclasses__():
+        # Hooks carry pp_key(), which drops the "FFmpeg" prefix: "Merger", "ExtractAudio", "FixupM4a"
+        names.add(subclass.pp_key())
+        names |= ffmpeg_postprocessor_names(subclass)
+    return frozenset(names)
+
+FFMPEG_POSTPROCESSORS = ffmpeg_postprocessor_names()
+
+class PostprocessPool:
+    """Host-wide slots for FFmpeg post-processing (merging, audio extraction, fixups)"""
+    def __init__(self, directory, workers, max_waiting):
+        self.directory = directory
+        self.workers = max(workers, 1)
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def _try_take(self):
+        first = random.randrange(self.workers)
+        for i in range(self.workers):
+            slot = open(os.path.join(self.directory, f"slot_{(first + i) % self.workers}.lock"), "w")
+            try:
+                fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot
+            except BlockingIOError:
+                slot.close()
+        return None
+    
+    def acquire(self):
+        """Block until a slot is free and return it"""
+        slot = self._try_take()
+        if slot:
+            return slot
+        start = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        metrics.add_gauge("postprocess_waiting", 1)
+        try:
+            while slot is None:
+                time.sleep(POSTPROCESS_POLL_INTERVAL)
+                slot = self._try_take()
+        finally:
+            with self._lock:
+                self.waiting -= 1
+            metrics.add_gauge("postprocess_waiting", -1)
+            metrics.observe("stage_duration_seconds", time.monotonic() - start, stage="postprocess_wait")
+        return slot
+    
+    def release(self, slot):
+        fcntl.flock(slot, fcntl.LOCK_UN)
+        slot.close()
+    
+    def check_admission(self):
+        """Refuse new interactive downloads while this process's backlog is full"""
+        if self.waiting >= self.max_waiting:
+            raise DownloadError("Server is busy processing other downloads. Please try again later.", 503)
+    
+    @contextmanager
+    def hooks(self, on_start=None):
+        """Yield a postprocessor hook that holds a slot for each FFmpeg step"""
+        held = {}
+        
+        def hook(d):
+            name = d.get("postprocessor")
+            if name not in FFMPEG_POSTPROCESSORS:
+                return
+            if d.get("status") == "started":
+                if on_start:
+                    on_start()
+                held[name] = self.acquire()
+                metrics.add_gauge("postprocess_active", 1)
+            elif d.get("status") == "finished" and name in held:
+                self.release(held.pop(name))
+                metrics.add_gauge("postprocess_active", -1)
+        
+        try:
+            yield hook
+        finally:
+            for slot in held.values():
+                self.release(slot)
+                metrics.add_gauge("postprocess_active", -1)
+
+postprocess_pool = PostprocessPool(os.path.join(CACHE_DIR, "postprocess"), POSTPROCESS_WORKERS, POSTPROCESS_QUEUE_SIZE)
+
+def postprocess_timer():
+    """Postprocessor hook recording each FFmpeg post-processing step as a stage"""
+    started = {}
+    
+    def hook(d):
+        name = d.get("postprocessor")
+        if d.get("status") == "started":
+            started[name] = time.monotonic()
+        elif d.get("status") == "finished" and name in started:
+            metrics.observe("stage_duration_seconds", time.monotonic() - started.pop(name), stage="postprocess")
+    return hook
+
+# Caps entry downloads across every playlist running in this process
+playlist_slots = BoundedSemaphore(PLAYLIST_CONCURRENCY)
+
+def download_playlist_entries(info, format_type, quality, session_dir, audio_only,
+                              concurrency=None, on_file=None, progress_hooks=(), progress=None, size_guard=None,
+                              resume=None, priority="interactive", cancel=None):
+    """Download playlist entries concurrently and return a result per entry"""
+    size_guard = size_guard or SizeGuard()
+    entries = [entry for entry in info.get("entries") or [] if entry]
+    endpoint_id = info.get(EXTRACTION_ENDPOINT_KEY)
+    concurrency = min(concurrency or PLAYLIST_JOB_CONCURRENCY, PLAYLIST_CONCURRENCY)
+    # Entries hand their network slot on once they reach post-processing
+    network_slots = BoundedSemaphore(concurrency)
+    if progress:
+        progress.playlist_count = len(entries)
+    
+    def download_entry(index, entry):
+        result = {
+            "index": index,
+            "id": entry.get("id"),
+            "title": entry.get("title", "Unknown Title"),
+            "status": "failed",
+            "error": None,
+            "files": []
+        }
+        entry_dir = os.path.join(session_dir, f"{index:04d}")
+        
+        def post_hook(file_path):
+            result["files"].append(file_path)
+            if on_file:
+                on_file(file_path)
+        
+        if size_guard.exceeded or (cancel and cancel.is_set()):
+            result["error"] = "Playlist exceeds size limit" if size_guard.exceeded else "Cancelled"
+            if progress:
+                progress.item_done(index, result["status"], result["error"])
+            return result
+        
+        entry_key = entry.get("id") or str(index)
+        finished_files = resume.files(entry_key) if resume else None
+        if finished_files:
+            try:
+                for file_path in finished_files:
+                    size_guard.hook({"status": "finished", "filename": file_path,
+                                     "downloaded_bytes": os.path.getsize(file_path)})
+                    post_hook(file_path)
+                result["status"] = "finished"
+            except SizeLimitExceeded:
+                result["error"] = "Playlist exceeds size limit"
+            if progress:
+                progress.item_done(index, result["status"], result["error"])
+            return result
+        
+        network_slots.acquire()
+        playlist_slots.acquire()
+        holding = [True]
+        
+        def release_network():
+            if holding:
+                holding.pop()
+                playlist_slots.release()
+                network_slots.release()
+        
+        try:
+            if cancel and cancel.is_set():
+                # Cancelled while waiting for a slot
+                raise DownloadCancelled("Download cancelled")
+            ydl_opts = downloader.get_download_opts(format_type, quality, entry_dir, audio_only, entry)
+            ydl_opts["progress_hooks"] = [size_guard.hook] + list(progress_hooks)
+            ydl_opts["post_hooks"] = [post_hook]
+            with postprocess_pool.hooks(on_start=release_network) as postprocess_gate:
+                ydl_opts["postprocessor_hooks"] = [postprocess_gate, postprocess_timer()]
+                if progress:
+                    progress.attach(ydl_opts, index)
+                with scheduler.slot(priority, endpoint_id, cost=0) as endpoint:
+                    ydl_opts.update(endpoint["options"])
+                    with metrics.stage("download"), YoutubeDL(ydl_opts) as ydl:
+                        ydl.process_ie_result(entry, download=True)
+            result["status"] = "finished" if result["files"] else "failed"
+            if not result["files"]:
+                result["error"] = "No file was downloaded"
+            elif resume:
+                resume.record(entry_key, result["files"])
+        except SizeLimitExceeded:
+            result["error"] = "Playlist exceeds size limit"
+        except DownloadCancelled:
+            result["error"] = "Cancelled"
+        except Exception as e:
+            logger.error(f"Error downloading playlist entry {index} ({result['id']}): {str(e)}")
+            result["error"] = str(e)
+        finally:
+            release_network()
+        if progress:
+            progress.item_done(index, result["status"], result["error"])
+        return result
+    
+    # Twice the download concurrency, so the next entries download while others encode
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1) * 2, thread_name_prefix="playlist") as executor:
+        futures = [executor.submit(download_entry, index, entry) for index, entry in enumerate(entries, 1)]
+        results = [future.result() for future in futures]
+    
+    failed = sum(1 for result in results if result["status"] != "finished")
+    logger.info(f"Playlist {info.get('id')}: {len(results) - failed} entries downloaded, {failed} failed")
+    return results
+
+def playlist_summary(results):
+    """Per-entry results without local file paths"""
+    return [{key: value for key, value in result.items() if key != "files"} for result in results]
+
+def unique_arcname(file_path, used_names):
+    """Archive name for a file, disambiguated if another entry had the same title"""
+    name = os.path.basename(file_path)
+    base, ext = os.path.splitext(name)
+    counter = 1
+    while name in used_names:
+        counter += 1
+        name = f"{base} ({counter}){ext}"
+    used_names.add(name)
+    return name
+
+class ArtifactCache:
+    """Content-addressed store of finished downloads"""
+    def __init__(self, directory):
+        self.directory = directory
+    
+    def key(self, url, format_type, quality, audio_only):
+        media_key = metadata_cache_key(url)
+        if not media_key:
+            return None
+        raw = json.dumps([media_key, format_type, str(quality).lower(), bool(audio_only)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+    
+    def _record_path(self, key):
+        return os.path.join(self.directory, f"artifact_{key}.json")
+    
+    def get(self, key, pin=True):
+        """Return the cached artifact for key, pinned unless pin=False, if it is present and not about to expire"""
+        try:
+            with open(self._record_path(key)) as f:
+                artifact = json.load(f)
+            path = artifact["path"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+        token = storage.pin(path) if pin else None
+        try:
+            age = time.time() - os.path.getctime(path)
+        except FileNotFoundError:
+            age = None
+        if age is None or age > min(artifact.get("max_age", FILE_EXPIRY), FILE_EXPIRY - ARTIFACT_EXPIRY_MARGIN):
+            if token:
+                storage.unpin(token)
+            return None
+        if token:
+            artifact["pin"] = token
+        return artifact
+    
+    def put(self, key, artifact, max_age=FILE_EXPIRY):
+        """Move a freshly downloaded artifact into the cache and return the cached record"""
+        ext = os.path.splitext(artifact["path"])[1]
+        cached_path = os.path.join(self.directory, f"artifact_{key}{ext}")
+        os.replace(artifact["path"], cached_path)
+        cached = dict(artifact, path=cached_path, max_age=max_age)
+        tmp_path = f"{self._record_path(key)}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cached, f)
+        os.replace(tmp_path, self._record_path(key))
+        return cached
+    
+    @contextmanager
+    def single_flight(self, key):
+        """Hold the per-key download lock"""
+        path = os.path.join(self.directory, f"artifact_{key}.lock")
+        while True:
+            lock_file = open(path, "a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            # Removed while we waited for it; a lock on the unlinked file excludes nobody
+            lock_file.close()
+        try:
+            yield
+        finally:
+            if not os.path.exists(self._record_path(key)):
+                os.remove(path)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+artifact_cache = ArtifactCache(DOWNLOAD_DIR)
+
+def run_download(url, format_type, quality, audio_only, session_id=None, concurrency=None, progress_id=None,
+                 priority="interactive"):
+    """Download a video or playlist and return its artifact, pinned for the caller to send or unpin"""
+    progress = DownloadProgress(progress_id) if progress_id else None
+    try:
+        with metrics.active("active_downloads"):
+            artifact = _run_cached_download(url, format_type, quality, audio_only, session_id, concurrency, progress,
+                                            priority)
+    except DownloadError as e:
+        metrics.inc("downloads_total", result=str(e.status_code))
+        if progress:
+            progress.finish(error=e.message)
+        raise
+    except Exception as e:
+        metrics.inc("downloads_total", result="500")
+        if progress:
+            progress.finish(error=str(e))
+        raise
+    metrics.inc("downloads_total", result="200")
+    if progress:
+        progress.finish()
+    return artifact
+
+def _run_cached_download(url, format_type, quality, audio_only, session_id, concurrency, progress, priority):
+    """Serve from the artifact cache, coalescing identical in-flight downloads"""
+    key = artifact_cache.key(url, format_type, quality, audio_only)
+    if not key:
+        artifact = _run_download(url, format_type, quality, audio_only, session_id, concurrency, progress, priority)
+        artifact["pin"] = storage.pin(artifact["path"])
+        storage.register(artifact["path"], "download")
+        return artifact
+    
+    artifact = artifact_cache.get(key)
+    metrics.inc("cache_requests_total", cache="artifact", result="hit" if artifact else "miss")
+    if artifact:
+        logger.info(f"Artifact cache hit for {url}")
+        return artifact
+    
+    with artifact_cache.single_flight(key):
+        # Another request may have finished the same download while we waited
+        artifact = artifact_cache.get(key)
+        if artifact:
+            metrics.inc("cache_requests_total", cache="artifact", result="coalesced")
+            logger.info(f"Reusing coalesced download for {url}")
+            return artifact
+        
+        artifact = _run_download(url, format_type, quality, audio_only, session_id, concurrency, progress, priority,
+                                 resume_key=key)
+        entries = artifact.get("entries")
+        if entries is None:
+            artifact = artifact_cache.put(key, artifact)
+        elif all(entry["status"] == "finished" for entry in entries):
+            # Playlists change; keep them only as long as their cached listing
+            artifact = artifact_cache.put(key, artifact, max_age=METADATA_CACHE_TTL)
+        # Pinned before registering, as registering may evict to make room
+        artifact["pin"] = storage.pin(artifact["path"])
+        storage.register(artifact["path"], "download")
+        return artifact
+
+def _run_download(url, format_type, quality, audio_only, session_id, concurrency, progress, priority,
+                  resume_key=None):
+    """Download into a session directory and move the result into DOWNLOAD_DIR"""
+    if priority == "interactive":
+        postprocess_pool.check_admission()
+    info = load_download_info(url, priority)
+    check_download_size(info, format_type, quality, audio_only)
+    size_guard = SizeGuard()
+    
+    # Create session directory
+    session_id = session_id or str(uuid.uuid4())
+    # A resume_key names a directory kept across failed attempts; the caller holds the key's single-flight lock
+    session_name = f"partial_{resume_key}" if resume_key else session_id
+    # Pinned before it is registered, so neither eviction nor expiry can take it while this attempt runs
+    pin = storage.pin(os.path.join(DOWNLOAD_DIR, session_name))
+    session_dir = create_session_dir(session_name, "partial" if resume_key else "session")
+    resume = ResumeState(session_dir) if resume_key else None
+    
+    try:
+        # Handle playlist downloads
+        if is_playlist_info(url, info):
+            results = download_playlist_entries(
+                info, format_type, quality, session_dir, audio_only,
+                concurrency=concurrency, progress=progress, size_guard=size_guard, resume=resume, priority=priority
+            )
+            if size_guard.exceeded:
+                raise DownloadError("Downloaded file exceeds size limit", 413)
+            finished = [result for result in results if result["status"] == "finished"]
+            if not finished:
+                raise DownloadError("No playlist entries could be downloaded", 500)
             
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+            zip_filename = f"playlist_{session_id}.zip"
+            zip_path = os.path.join(DOWNLOAD_DIR, zip_filename)
             
-            # Handle playlist downloads
-            if is_playlist or ("entries" in info and info.get("_type") == "playlist"):
-                zip_filename = f"playlist_{session_id}.zip"
-                zip_path = os.path.join(DOWNLOAD_DIR, zip_filename)
-                
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for root, _, files in os.walk(session_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, session_dir)
-                            zipf.write(file_path, arcname)
-                
-                # Cleanup session directory
-                shutil.rmtree(session_dir, ignore_errors=True)
-                
-                # Check file size
-                if os.path.getsize(zip_path) > MAX_FILE_SIZE:
-                    os.remove(zip_path)
-                    return jsonify({"error": "Downloaded file exceeds size limit"}), 413
-                
-                return send_file(
-                    zip_path,
-                    as_attachment=True,
-                    download_name=f"{info.get('title', 'playlist')}.zip"
-                )
+            # Media is already compressed; store entries instead of deflating them
+            used_names = set()
+            with metrics.stage("zip"), zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as zipf:
+                for result in finished:
+                    for file_path in result["files"]:
+                        if os.path.isfile(file_path):
+                            zipf.write(file_path, unique_arcname(file_path, used_names))
             
-            # Handle single video/audio download
+            # Cleanup session directory; with failed entries it is kept so a retry only fetches those
+            if not resume or len(finished) == len(results):
+                remove_session_dir(session_dir)
             else:
-                files = [f for f in os.listdir(session_dir) if os.path.isfile(os.path.join(session_dir, f))]
-                if not files:
-                    return jsonify({"error": "No file was downloaded"}), 500
-                
-                downloaded_file = os.path.join(session_dir, files[0])
-                
-                # Check file size
-                if os.path.getsize(downloaded_file) > MAX_FILE_SIZE:
-                    shutil.rmtree(session_dir, ignore_errors=True)
-                    return jsonify({"error": "Downloaded file exceeds size limit"}), 413
+                storage.register(session_dir, "partial")
+            
+            # Check file size
+            if os.path.getsize(zip_path) > MAX_FILE_SIZE:
+                os.remove(zip_path)
+                raise DownloadError("Downloaded file exceeds size limit", 413)
+            
+            return {
+                "path": zip_path,
+                "download_name": f"{info.get('title', 'playlist')}.zip",
+                "entries": playlist_summary(results)
+            }
+        
+        # Handle single video/audio download
+        files = resume.files("video") if resume else None
+        if not files:
+            files = []
+            ydl_opts = downloader.get_download_opts(format_type, quality, session_dir, audio_only, info)
+            ydl_opts["progress_hooks"] = [size_guard.hook]
+            # The session directory may also hold .part files and resume records
+            ydl_opts["post_hooks"] = [files.append]
+            if progress:
+                progress.attach(ydl_opts)
+            
+            try:
+                with postprocess_pool.hooks() as postprocess_gate, \
+                        scheduler.slot(priority, info.get(EXTRACTION_ENDPOINT_KEY), cost=0) as endpoint:
+                    # The gate goes first so the other hooks see the step start once it has a slot
+                    ydl_opts["postprocessor_hooks"] = [postprocess_gate] + ydl_opts.get("postprocessor_hooks", []) + [postprocess_timer()]
+                    ydl_opts.update(endpoint["options"])
+                    with metrics.stage("download"), YoutubeDL(ydl_opts) as ydl:
+                        ydl.process_ie_result(info, download=True)
+            except SizeLimitExceeded:
+                raise DownloadError("Downloaded file exceeds size limit", 413)
+            
+            if not files:
+                raise DownloadError("No file was downloaded", 500)
+            if resume:
+                resume.record("video", files)
+        
+        downloaded_file = files[0]
+        file_name = os.path.basename(downloaded_file)
+        
+        # Check file size
+        if os.path.getsize(downloaded_file) > MAX_FILE_SIZE:
+            raise DownloadError("Downloaded file exceeds size limit", 413)
+        
+        # Move file to downloads directory for serving
+        final_filename = f"{session_id}_{file_name}"
+        final_path = os.path.join(DOWNLOAD_DIR, final_filename)
+        shutil.move(downloaded_file, final_path)
+        remove_session_dir(session_dir)
+        
+        return {"path": final_path, "download_name": file_name}
+            
+    except Exception as e:
+        # Keep what a resumable attempt transferred unless the download can never succeed
+        if not resume or (isinstance(e, DownloadError) and e.status_code == 413):
+            remove_session_dir(session_dir)
+        else:
+            # Index what was kept so it counts against the storage budget
+            storage.register(session_dir, "partial")
+        raise
+    finally:
+        storage.unpin(pin)
+
+class ZipStreamBuffer:
+    """Write-only, unseekable sink for zipfile output that is drained chunk by chunk"""
+    # zipfile writes data descriptors to an unseekable target, so entries go out before their size and CRC are known
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_playlist_zip(url, format_type, quality, audio_only, info, concurrency=None, progress_id=None):
+    """Admit a streamed playlist download and return a generator of its stored ZIP64 archive"""
+    # Checked before the response starts, so a busy server still answers with a proper 503
+    postprocess_pool.check_admission()
+    return _stream_playlist_zip(format_type, quality, audio_only, info, concurrency, progress_id)
+
+def _stream_playlist_zip(format_type, quality, audio_only, info, concurrency, progress_id):
+    """Download a playlist in the background and yield a stored ZIP64 archive"""
+    started = time.monotonic()
+    result = "200"
+    metrics.add_gauge("active_downloads", 1)
+    session_id = str(uuid.uuid4())
+    session_dir = create_session_dir(session_id)
+    
+    finished_files = queue.Queue()
+    cancel = Event()
+    
+    def cancel_hook(_):
+        if cancel.is_set():
+            raise DownloadCancelled("Client disconnected")
+    
+    progress = DownloadProgress(progress_id) if progress_id else None
+    size_guard = SizeGuard()
+    
+    def download_worker():
+        try:
+            download_playlist_entries(
+                info, format_type, quality, session_dir, audio_only, concurrency=concurrency,
+                on_file=finished_files.put, progress_hooks=[cancel_hook], progress=progress, size_guard=size_guard,
+                cancel=cancel
+            )
+            if progress:
+                progress.finish()
+        except Exception as e:
+            logger.error(f"Error in streamed playlist download {session_id}: {str(e)}")
+            if progress:
+                progress.finish(error=str(e))
+        finally:
+            finished_files.put(None)
+            if cancel.is_set():
+                # Entries still running at disconnect may have written into the directory after it was removed
+                remove_session_dir(session_dir)
+    
+    worker = Thread(target=download_worker, name=f"zip-stream-{session_id}", daemon=True)
+    worker.start()
+    
+    buffer = ZipStreamBuffer()
+    used_names = set()
+    total_size = 0
+    try:
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED, allowZip64=True) as zipf:
+            while True:
+                file_path = finished_files.get()
+                if file_path is None:
+                    if size_guard.exceeded:
+                        # Entries were stopped by the size limit; do not pass the rest off as the whole playlist
+                        logger.warning(f"Streamed playlist {session_id} exceeded size limit, aborting archive")
+                        raise DownloadError("Playlist exceeds size limit", 413)
+                    break
+                if not os.path.isfile(file_path):
+                    continue
                 
-                # Move file to downloads directory for serving
-                final_filename = f"{session_id}_{files[0]}"
-                final_path = os.path.join(DOWNLOAD_DIR, final_filename)
-                shutil.move(downloaded_file, final_path)
-                shutil.rmtree(session_dir, ignore_errors=True)
+                total_size += os.path.getsize(file_path)
+                if total_size > MAX_FILE_SIZE:
+                    # Raising drops the connection; a well-formed partial archive would pass for a complete one
+                    logger.warning(f"Streamed playlist {session_id} exceeded size limit, aborting archive")
+                    raise DownloadError("Playlist exceeds size limit", 413)
                 
-                return send_file(
-                    final_path,
-                    as_attachment=True,
-                    download_name=files[0]
+                zinfo = zipfile.ZipInfo.from_file(file_path, unique_arcname(file_path, used_names))
+                with open(file_path, 'rb') as src, zipf.open(zinfo, 'w') as dest:
+                    while True:
+                        chunk = src.read(STREAM_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = buffer.drain()
+                        metrics.inc("bytes_served_total", len(data))
+                        yield data
+                os.remove(file_path)
+                yield buffer.drain()
+        
+        # Central directory
+        yield buffer.drain()
+    except GeneratorExit:
+        result = "499"
+        raise
+    except DownloadError as e:
+        result = str(e.status_code)
+        raise
+    except Exception:
+        result = "500"
+        raise
+    finally:
+        # Stops entries that have not finished; the worker removes the directory again once they have
+        cancel.set()
+        worker.join(timeout=1)
+        remove_session_dir(session_dir)
+        metrics.add_gauge("active_downloads", -1)
+        metrics.inc("downloads_total", result=result)
+        metrics.observe("stage_duration_seconds", time.monotonic() - started, stage="stream_zip")
+
+def can_stream_copy(formats, format_type):
+    """Whether every stream of the formats can be copied into format_type's muxer as is"""
+    if format_type not in STREAM_THROUGH_CODECS:
+        return False
+    for f in formats:
+        for field, allowed in zip(("vcodec", "acodec"), STREAM_THROUGH_CODECS[format_type]):
+            codec = f.get(field)
+            if codec == "none" or allowed is None:
+                continue
+            # An unknown codec could fail the muxer halfway through the response
+            if not codec or codec.split(".")[0].lower() not in allowed:
+                return False
+    return True
+
+def plan_stream_through(info, format_type, quality, audio_only):
+    """Pick the source formats for relaying a single video without staging it, or None"""
+    if audio_only:
+        audio_plan = downloader.plan_audio(format_type, quality, info)
+        if not audio_plan["copy"]:
+            return None
+        spec = audio_plan["format"]
+    else:
+        spec = downloader.get_download_opts(format_type, quality, DOWNLOAD_DIR)["format"]
+    
+    try:
+        formats = select_formats(info, spec)
+    except Exception as e:
+        logger.info(f"No stream-through format for {info.get('id')}: {str(e)}")
+        return None
+    
+    if any(f.get("protocol") not in ("http", "https") or not f.get("url") for f in formats):
+        return None
+    # DASH m4a needs the remux yt-dlp's FixupM4a applies to staged downloads, so it goes through ffmpeg
+    direct = len(formats) == 1 and formats[0].get("ext") == format_type and formats[0].get("container") != "m4a_dash"
+    if not direct and not (shutil.which("ffmpeg") and can_stream_copy(formats, format_type)):
+        return None
+    return {
+        "formats": formats,
+        "direct": direct,
+        "audio_only": audio_only,
+        "format_type": format_type,
+        "estimated_size": sum(estimate_format_size(f, info.get("duration")) for f in formats) or None,
+        "download_name": f"{info.get('title', 'video')}.{format_type}"
+    }
+
+def open_stream_through(plan, endpoint):
+    """Connect to the sources of a stream-through plan and return (chunks, content_length)"""
+    proxy = endpoint["options"].get("proxy")
+    if plan["direct"]:
+        source = plan["formats"][0]
+        chunk_size = (source.get("downloader_options") or {}).get("http_chunk_size")
+        session = requests.Session()
+        
+        def fetch(start):
+            headers = dict(source.get("http_headers") or {})
+            if chunk_size:
+                headers["Range"] = f"bytes={start}-{start + chunk_size - 1}"
+            response = session.get(
+                source["url"], headers=headers, stream=True, timeout=30,
+                proxies={"http": proxy, "https": proxy} if proxy else None
+            )
+            if response.status_code >= 400:
+                response.close()
+                if response.status_code == 429:
+                    scheduler.report(endpoint, rate_limited=True)
+                    raise DownloadError("YouTube is rate limiting requests. Please try again later.", 429)
+                raise DownloadError(f"Source returned HTTP {response.status_code}", 502)
+            return response
+        
+        try:
+            first = fetch(0)
+        except Exception:
+            session.close()
+            raise
+        content_range = re.match(r'bytes \d+-\d+/(\d+)', first.headers.get("Content-Range", ""))
+        if first.status_code == 206 and content_range:
+            content_length = int(content_range.group(1))
+        elif first.status_code == 200 and first.headers.get("Content-Length"):
+            content_length = int(first.headers["Content-Length"])
+        else:
+            content_length = None
+        
+        def relay():
+            response, sent = first, 0
+            try:
+                while True:
+                    received = 0
+                    with response:
+                        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                            received += len(chunk)
+                            yield chunk
+                    sent += received
+                    if response.status_code != 206 or not content_length or sent >= content_length or not received:
+                        break
+                    response = fetch(sent)
+                if content_length and sent < content_length:
+                    raise DownloadError("Source ended before the whole file was sent", 502)
+            finally:
+                session.close()
+        
+        return relay(), content_length
+    
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error"]
+    for source in plan["formats"]:
+        headers = "".join(f"{name}: {value}\r\n" for name, value in (source.get("http_headers") or {}).items())
+        if headers:
+            command += ["-headers", headers]
+        command += ["-i", source["url"]]
+    for index in range(len(plan["formats"])):
+        command += ["-map", str(index)]
+    if plan["audio_only"]:
+        command += ["-vn"]
+    command += ["-c", "copy"] + STREAM_THROUGH_MUXERS[plan["format_type"]] + ["pipe:1"]
+    
+    env = dict(os.environ, http_proxy=proxy) if proxy else None
+    stderr = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, env=env)
+    
+    def relay():
+        try:
+            while True:
+                chunk = process.stdout.read1(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            if process.wait() != 0:
+                stderr.seek(0)
+                logger.error(f"ffmpeg stream-through failed: {stderr.read().decode('utf-8', 'replace').strip()}")
+                raise DownloadError("Stream-through failed before the whole file was sent", 502)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            stderr.close()
+    
+    return relay(), None
+
+def stream_through_response(url, format_type, quality, audio_only, info, concurrency=None, progress_id=None):
+    """Relay a single video to the client as its bytes arrive, or None to fall back to a staged download"""
+    key = artifact_cache.key(url, format_type, quality, audio_only)
+    if key and artifact_cache.get(key, pin=False):
+        # Already on disk; the staged path serves it without touching YouTube
+        return None
+    
+    plan = plan_stream_through(info, format_type, quality, audio_only)
+    if not plan:
+        return None
+    if plan["estimated_size"] and plan["estimated_size"] > MAX_FILE_SIZE:
+        raise DownloadError("Downloaded file exceeds size limit", 413)
+    
+    endpoint = scheduler.acquire("interactive", info.get(EXTRACTION_ENDPOINT_KEY), cost=0)
+    chunks, content_length = open_stream_through(plan, endpoint)
+    if content_length and content_length > MAX_FILE_SIZE:
+        chunks.close()
+        raise DownloadError("Downloaded file exceeds size limit", 413)
+    
+    # Pull the first chunk now so a source that fails to open gets a proper status
+    first = next(chunks, b"")
+    if not first:
+        chunks.close()
+        raise DownloadError("Download failed: no data received from source", 502)
+    
+    progress = DownloadProgress(progress_id) if progress_id else None
+    progress_hook = progress.hooks()[0] if progress else None
+    total = content_length or plan["estimated_size"]
+    
+    def generate():
+        started = time.monotonic()
+        sent = 0
+        result = "200"
+        metrics.add_gauge("active_downloads", 1)
+        try:
+            for chunk in itertools.chain([first], chunks):
+                sent += len(chunk)
+                if sent > MAX_FILE_SIZE:
+                    logger.warning(f"Stream-through of {info.get('id')} exceeded size limit, aborting")
+                    result = "413"
+                    raise DownloadError("Downloaded file exceeds size limit", 413)
+                metrics.inc("bytes_served_total", len(chunk))
+                if progress_hook:
+                    progress_hook({
+                        "status": "downloading", "downloaded_bytes": sent, "total_bytes": total,
+                        "speed": sent / max(time.monotonic() - started, 1e-6), "filename": plan["download_name"]
+                    })
+                yield chunk
+        except GeneratorExit:
+            result = "499"
+            raise
+        except DownloadError as e:
+            result = str(e.status_code)
+            raise
+        except Exception:
+            result = "502"
+            raise
+        finally:
+            chunks.close()
+            metrics.add_gauge("active_downloads", -1)
+            metrics.inc("downloads_total", result=result)
+            metrics.observe("stage_duration_seconds", time.monotonic() - started, stage="stream_through")
+            if progress:
+                progress.finish(error=None if result == "200" else "Stream ended early")
+    
+    headers = {"Content-Disposition": attachment_header(plan["download_name"]), "X-Stream-Through": "1"}
+    if content_length:
+        headers["Content-Length"] = str(content_length)
+    mimetype = mimetypes.guess_type(plan["download_name"])[0] or "application/octet-stream"
+    return Response(generate(), mimetype=mimetype, headers=headers)
+
+def attachment_header(download_name):
+    """Content-Disposition value for a download name, RFC 5987 encoded if needed"""
+    ascii_name = unicodedata.normalize("NFKD", download_name).encode("ascii", "ignore").decode("ascii")
+    ascii_name = ascii_name.replace("\\", "\\\\").replace('"', '\\"')
+    if ascii_name == download_name:
+        return f'attachment; filename="{ascii_name}"'
+    return f'attachment; filename="{ascii_name}"; filename*=UTF-8\'\'{quote(download_name, safe="")}'
+
+class DownloadJobQueue(SQLiteStore):
+    """Durable queue of download jobs shared by the API and worker.py"""
+    # JOB_DIR may be a volume shared between hosts, and WAL only works between processes on one host
+    journal_mode = "DELETE"
+    schema = (
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "id TEXT PRIMARY KEY, status TEXT, params TEXT, created_at REAL, updated_at REAL, "
+        "attempts INTEGER, worker TEXT, lease_expires REAL, error TEXT, status_code INTEGER, "
+        "file TEXT, download_name TEXT, entries TEXT)",
+        "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)"
+    )
+    columns = ("id", "status", "params", "created_at", "updated_at", "attempts", "worker", "lease_expires",
+               "error", "status_code", "file", "download_name", "entries")
+    
+    def __init__(self, path, workers, max_queued):
+        super().__init__(path)
+        self.workers = workers
+        self.max_queued = max_queued
+        self._threads = []
+        self._lock = Lock()
+        self._wakeup = Condition()
+    
+    def _transaction(self, work):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def get(self, job_id):
+        """Load job state, or None if the job is unknown"""
+        row = self._connect().execute(
+            f"SELECT {', '.join(self.columns)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self.columns, row))
+        job["params"] = json.loads(job["params"])
+        job["entries"] = json.loads(job["entries"]) if job["entries"] else None
+        job["created_at"] = datetime.fromtimestamp(job["created_at"]).isoformat()
+        job["updated_at"] = datetime.fromtimestamp(job["updated_at"]).isoformat()
+        return job
+    
+    def submit(self, params):
+        """Queue a download and return its job record"""
+        self.start()
+        job_id = str(uuid.uuid4())
+        params = dict(params, progress_id=params.get("progress_id") or job_id)
+        now = time.time()
+        
+        def work(conn):
+            (waiting,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+            if waiting >= self.max_queued:
+                return None
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, created_at, updated_at, attempts) VALUES (?, 'queued', ?, ?, ?, 0)",
+                (job_id, json.dumps(params), now, now)
+            )
+            return waiting + 1
+        waiting = self._transaction(work)
+        if waiting is None:
+            raise DownloadError("Download queue is full. Please try again later.", 503)
+        
+        with self._wakeup:
+            self._wakeup.notify()
+        logger.info(f"Queued download job {job_id} ({waiting}/{self.max_queued} waiting)")
+        return self.get(job_id)
+    
+    def queue_depth(self):
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+    
+    def lease(self, worker):
+        """Take the oldest waiting job, or one whose worker stopped sending heartbeats"""
+        now = time.time()
+        
+        def work(conn):
+            while True:
+                row = conn.execute(
+                    "SELECT id, attempts FROM jobs WHERE status IN ('queued', 'running') "
+                    "AND (status = 'queued' OR lease_expires < ?) ORDER BY created_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, attempts = row
+                if attempts >= JOB_MAX_ATTEMPTS:
+                    # Do not let a job that keeps killing its worker loop forever
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, status_code = 500, updated_at = ? WHERE id = ?",
+                        ("Download was interrupted too many times", now, job_id)
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE id = ?",
+                    (worker, now + JOB_LEASE_TIMEOUT, now, job_id)
                 )
-                
+                return job_id
+        job_id = self._transaction(work)
+        return self.get(job_id) if job_id else None
+    
+    def heartbeat(self, job_id, worker):
+        """Renew a lease; False if the job has been handed to another worker"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time() + JOB_LEASE_TIMEOUT, job_id, worker)
+        )
+        return cursor.rowcount == 1
+    
+    def complete(self, job_id, worker, status, error=None, status_code=None, file=None, download_name=None,
+                 entries=None):
+        """Record the outcome of a leased job, unless the lease was lost meanwhile"""
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, error = ?, status_code = ?, file = ?, download_name = ?, entries = ?, "
+            "updated_at = ?, lease_expires = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+            (status, error, status_code, file, download_name, json.dumps(entries) if entries is not None else None,
+             time.time(), job_id, worker)
+        )
+    
+    def expire(self, max_age):
+        """Forget finished and failed jobs older than max_age seconds"""
+        return self._connect().execute(
+            "DELETE FROM jobs WHERE status IN ('finished', 'failed') AND created_at < ?", (time.time() - max_age,)
+        ).rowcount
+    
+    def run_job(self, job, worker):
+        """Run a leased job, renewing the lease until it is done"""
+        done = Event()
+        
+        def keep_leased():
+            while not done.wait(JOB_HEARTBEAT_INTERVAL):
+                try:
+                    if not self.heartbeat(job["id"], worker):
+                        logger.warning(f"Lease on download job {job['id']} was lost")
+                        return
+                except sqlite3.Error as e:
+                    logger.error(f"Heartbeat for download job {job['id']} failed: {str(e)}")
+        
+        Thread(target=keep_leased, name=f"heartbeat-{job['id'][:8]}", daemon=True).start()
+        try:
+            with metrics.active("active_jobs"):
+                artifact = run_download(session_id=job["id"], priority="bulk", **job["params"])
+            # The job's file route pins the file again when it is fetched
+            storage.unpin(artifact["pin"])
+            outcome = {
+                "status": "finished",
+                "file": artifact["path"],
+                "download_name": artifact["download_name"],
+                "entries": artifact.get("entries")
+            }
+        except DownloadError as e:
+            outcome = {"status": "failed", "error": e.message, "status_code": e.status_code}
         except Exception as e:
-            # Cleanup on error
-            if os.path.exists(session_dir):
-                shutil.rmtree(session_dir, ignore_errors=True)
-            raise e
-            
+            logger.error(f"Error in download job {job['id']}: {str(e)}")
+            outcome = {"status": "failed", "error": f"Download failed: {str(e)}", "status_code": 500}
+        finally:
+            done.set()
+        try:
+            self.complete(job["id"], worker, **outcome)
+        except sqlite3.Error as e:
+            # The lease runs out and another worker takes the job again
+            logger.error(f"Could not record the outcome of download job {job['id']}: {str(e)}")
+    
+    def work(self, worker, stop):
+        """Lease and run jobs one after another until stop is set"""
+        while not stop.is_set():
+            try:
+                job = self.lease(worker)
+            except sqlite3.Error as e:
+                logger.error(f"Could not lease a download job: {str(e)}")
+                job = None
+            if job is None:
+                # Jobs submitted by this process wake the loop; others are picked up on the next poll
+                with self._wakeup:
+                    self._wakeup.wait(JOB_POLL_INTERVAL)
+                continue
+            logger.info(f"{worker} running download job {job['id']} (attempt {job['attempts']})")
+            self.run_job(job, worker)
+    
+    def start(self, workers=None, stop=None):
+        """Run job threads in this process; started after gunicorn forks"""
+        workers = self.workers if workers is None else workers
+        with self._lock:
+            if self._threads:
+                return self._threads
+            for i in range(workers):
+                worker = f"{socket.gethostname()}:{os.getpid()}:{i}"
+                thread = Thread(target=self.work, args=(worker, stop or Event()), name=f"download-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            return self._threads
+
+job_queue = DownloadJobQueue(os.path.join(JOB_DIR, "queue.sqlite3"), JOB_WORKERS, JOB_QUEUE_SIZE)
+
+def job_response(job):
+    """Public view of a job record"""
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "updated_at": job.get("updated_at"),
+        "status_url": f"/api/jobs/{job['id']}",
+        "progress_url": f"/api/progress/{job['params'].get('progress_id') or job['id']}"
+    }
+    if job["status"] == "finished":
+        response["file_url"] = f"/api/jobs/{job['id']}/file"
+        response["download_name"] = job["download_name"]
+        if job.get("entries") is not None:
+            response["entries"] = job["entries"]
+    elif job["status"] == "failed":
+        response["error"] = job["error"]
+    return response
+
+@app.route("/api/download", methods=["POST"])
+def download_video():
+    """Download video or playlist (video or audio)"""
+    try:
+        data = request.get_json()
+        params = parse_download_request(data)
+        
+        # Queued; the client polls /api/jobs/<job_id>
+        if data.get("async", False):
+            job = job_queue.submit(params)
+            return jsonify(job_response(job)), 202
+        
+        # Playlists as a chunked ZIP, single videos relayed from the source when no transcoding is needed
+        if data.get("stream", False):
+            info = load_download_info(params["url"])
+            check_download_size(info, params["format_type"], params["quality"], params["audio_only"])
+            if is_playlist_info(params["url"], info):
+                return Response(
+                    stream_playlist_zip(info=info, **params),
+                    mimetype="application/zip",
+                    headers={"Content-Disposition": attachment_header(f"{info.get('title', 'playlist')}.zip")}
+                )
+            response = stream_through_response(info=info, **params)
+            if response:
+                return response
+        
+        artifact = run_download(**params)
+        response = send_download(artifact["path"], artifact["download_name"], pin=artifact["pin"])
+        if artifact.get("entries") is not None:
+            failed = sum(1 for entry in artifact["entries"] if entry["status"] != "finished")
+            response.headers["X-Playlist-Entries"] = str(len(artifact["entries"]))
+            response.headers["X-Playlist-Entries-Failed"] = str(failed)
+        return response
+        
+    except DownloadError as e:
+        return jsonify({"error": e.message}), e.status_code
     except Exception as e:
         logger.error(f"Error in download_video: {str(e)}")
         return jsonify({"error": f"Download failed: {str(e)}"}), 500
 
+@app.route("/api/progress/<progress_id>")
+def stream_progress(progress_id):
+    """Server-Sent Events stream of download progress"""
+    if not re.match(PROGRESS_ID_REGEX, progress_id):
+        return jsonify({"error": "Invalid progress ID"}), 400
+    
+    def generate():
+        for snapshot in progress_broker.subscribe(progress_id):
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: progress\nid: {snapshot['version']}\ndata: {json.dumps(snapshot)}\n\n"
+    
+    return Response(generate(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/jobs/<job_id>")
+def get_job_status(job_id):
+    """Get status of a queued download job"""
+    if not re.match(JOB_ID_REGEX, job_id):
+        return jsonify({"error": "Invalid job ID"}), 400
+    
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    
+    return jsonify(job_response(job))
+
+@app.route("/api/jobs/<job_id>/file")
+def get_job_file(job_id):
+    """Serve the artifact of a finished download job"""
+    if not re.match(JOB_ID_REGEX, job_id):
+        return jsonify({"error": "Invalid job ID"}), 400
+    
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == "failed":
+        return jsonify({"error": job["error"]}), job["status_code"] or 500
+    if job["status"] != "finished":
+        return jsonify({"error": "Job is not finished yet", "status": job["status"]}), 409
+    if not os.path.exists(job["file"]):
+        return jsonify({"error": "File has expired"}), 410
+    
+    return send_download(job["file"], job["download_name"])
+
+@app.route("/api/qualities/<video_id>")
+def get_video_qualities(video_id):
+    """Resolve available qualities for a single video, e.g. a flat playlist entry"""
+    try:
+        if not re.match(r'^[A-Za-z0-9_-]+$', video_id):
+            return jsonify({"error": "Invalid video ID"}), 400
+        
+        audio_only = request.args.get("audio_only", "0").lower() in ("1", "true", "yes")
+        try:
+            info = extract_info_cached(f"https://www.youtube.com/watch?v={video_id}")
+        except Exception as e:
+            error_response = extraction_error_response(e)
+            if error_response:
+                return error_response
+            raise
+        
+        return jsonify({
+            "video_id": video_id,
+            "available_qualities": get_available_qualities(info, audio_only)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting qualities for {video_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/metrics")
+def get_metrics():
+    """Prometheus metrics for all workers"""
+    try:
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/cache/stats")
+def get_cache_stats():
+    """Metadata cache hit/miss counters, storage usage, extraction scheduler and YoutubeDL pool state"""
+    try:
+        return jsonify(dict(
+            metadata_cache.stats(), storage=storage.stats(), extraction=scheduler.stats(), ydl_pool=ydl_pool.stats()
+        ))
+    except Exception as e:
+        logger.error(f"Error reading cache stats: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/api/thumbnail/<video_id>")
 def serve_thumbnail(video_id):
     """Serve video thumbnail"""
@@ -508,11 +3301,31 @@ def serve_thumbnail(video_id):
         if not re.match(r'^[A-Za-z0-9_-]+$', video_id):
             return "Invalid video ID", 400
         
-        thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{video_id}.jpg")
-        if os.path.exists(thumbnail_path):
-            return send_file(thumbnail_path, mimetype='image/jpeg')
+        size = request.args.get("size", "full").lower()
+        fmt = request.args.get("format", "jpeg").lower().replace("jpg", "jpeg")
+        if size not in THUMBNAIL_SIZES:
+            return f"Invalid size. Supported: {', '.join(THUMBNAIL_SIZES)}", 400
+        if fmt not in THUMBNAIL_FORMATS:
+            return f"Invalid format. Supported: {', '.join(THUMBNAIL_FORMATS)}", 400
+        
+        key = (video_id, size, fmt)
+        entry = thumbnail_memory_cache.get(key)
+        metrics.inc("cache_requests_total", cache="thumbnail", result="hit" if entry else "miss")
+        if entry is None:
+            try:
+                data = load_thumbnail_variant(video_id, size, fmt)
+            except FutureTimeoutError:
+                # A slow origin; the fetch carries on and a retry will likely find it saved
+                return "Thumbnail fetch timed out", 504, {"Retry-After": str(THUMBNAIL_RETRY_AFTER)}
+            if data is None:
+                return "Thumbnail not found", 404
+            entry = thumbnail_memory_cache.put(key, data)
         
-        return "Thumbnail not found", 404
+        data, etag = entry
+        response = Response(data, mimetype=THUMBNAIL_FORMATS[fmt][1])
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = f"public, max-age={THUMBNAIL_MAX_AGE}"
+        return response.make_conditional(request)
         
     except Exception as e:
         logger.error(f"Error serving thumbnail {video_id}: {str(e)}")
@@ -526,35 +3339,32 @@ def get_video_formats(video_id):
             return jsonify({"error": "Invalid video ID"}), 400
         
         url = f"https://www.youtube.com/watch?v={video_id}"
-        ydl_opts = downloader.get_info_opts()
+        info = extract_info_cached(url)
+        formats = info.get("formats", [])
         
-        with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            formats = info.get("formats", [])
-            
-            processed_formats = []
-            for f in formats:
-                processed_formats.append({
-                    "format_id": f.get("format_id"),
-                    "ext": f.get("ext"),
-                    "height": f.get("height"),
-                    "width": f.get("width"),
-                    "fps": f.get("fps"),
-                    "filesize": f.get("filesize"),
-                    "acodec": f.get("acodec", "none"),
-                    "vcodec": f.get("vcodec", "none"),
-                    "abr": f.get("abr"),  # Audio bitrate
-                    "asr": f.get("asr"),  # Audio sample rate
-                    "audio_channels": f.get("audio_channels"),
-                    "format_note": f.get("format_note"),
-                    "url": f.get("url"),
-                })
-            
-            return jsonify({
-                "video_id": video_id,
-                "formats": processed_formats
+        processed_formats = []
+        for f in formats:
+            processed_formats.append({
+                "format_id": f.get("format_id"),
+                "ext": f.get("ext"),
+                "height": f.get("height"),
+                "width": f.get("width"),
+                "fps": f.get("fps"),
+                "filesize": f.get("filesize"),
+                "acodec": f.get("acodec", "none"),
+                "vcodec": f.get("vcodec", "none"),
+                "abr": f.get("abr"),  # Audio bitrate
+                "asr": f.get("asr"),  # Audio sample rate
+                "audio_channels": f.get("audio_channels"),
+                "format_note": f.get("format_note"),
+                "url": f.get("url"),
             })
-            
+        
+        return jsonify({
+            "video_id": video_id,
+            "formats": processed_formats
+        })
+        
     except Exception as e:
         logger.error(f"Error getting formats for {video_id}: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -573,23 +3383,54 @@ def request_entity_too_large(error):
     return jsonify({"error": "Request too large"}), 413
 
 # Startup cleanup and periodic cleanup
+cleanup_scheduler_process = None
+
 def start_cleanup_scheduler():
-    """Start background cleanup task"""
+    """Start background cleanup task, once per process; only the holder of the cleanup lock runs it"""
+    global cleanup_scheduler_process
+    if cleanup_scheduler_process == os.getpid():
+        return
+    cleanup_scheduler_process = os.getpid()
+    
     def cleanup_worker():
-        import time
+        lock_file = None
         while True:
             time.sleep(CLEANUP_INTERVAL)
+            if lock_file is None:
+                # Held until this process exits, so one process per host cleans up and another takes over after it
+                lock_file = open(os.path.join(CACHE_DIR, "cleanup.lock"), "w")
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock_file.close()
+                    lock_file = None
+                    continue
             cleanup_old_files()
     
-    cleanup_thread = Thread(target=cleanup_worker, daemon=True)
+    cleanup_thread = Thread(target=cleanup_worker, name="cleanup", daemon=True)
     cleanup_thread.start()
 
+_started = {}  # Startup part -> pid of the process that ran it
+
+def start_up(server=True, worker=True):
+    """Startup shared by every entry point; gunicorn runs the server part in its master, the worker part per fork"""
+    # Parts already run are skipped, so an ASGI lifespan under the gunicorn hooks does not repeat them
+    if server and "server" not in _started:
+        _started["server"] = os.getpid()
+        warm_up()
+        # Index anything written before the storage index existed, then clean up
+        storage.reconcile({"download": DOWNLOAD_DIR, "thumbnail": THUMBNAIL_DIR, "job": JOB_DIR})
+        cleanup_old_files()
+    if worker and _started.get("worker") != os.getpid():
+        _started["worker"] = os.getpid()
+        ydl_pool.prefill(YDL_POOL_PREFILL)
+        # Threads belong in workers; gunicorn's master keeps forking and must not hold SQLite or other locks
+        start_cleanup_scheduler()
+        # Download jobs run in the API processes unless JOB_WORKERS=0 leaves them to worker.py
+        job_queue.start()
+
 if __name__ == "__main__":
-    # Initial cleanup
-    cleanup_old_files()
-    
-    # Start cleanup scheduler
-    start_cleanup_scheduler()
+    start_up()
     
     logger.info("Starting YouTube Downloader Backend v2.1")
     app.run(
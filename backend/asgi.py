@@ -0,0 +1,251 @@
+"""ASGI entry point for the downloader backend.
+
+Runs the same Flask app as app:app, but under an event loop:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker --workers 3 asgi:app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+With gunicorn.conf.py its hooks run startup once in the master and once
+per worker, and the lifespan startup below finds nothing left to do.
+
+Each request is classified by the Flask endpoint it routes to. Blocking
+work (yt-dlp extraction, downloads and FFmpeg post-processing, progress
+streams, everything else) runs in a separate bounded executor per class, so
+a burst of slow extractions can only exhaust the extraction executor while
+/api/health keeps being answered directly on the event loop.
+"""
+import os
+import sys
+import json
+import asyncio
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.wsgi import FileWrapper
+
+import app as backend
+from app import logger, metrics
+
+# Workers and waiting requests allowed per class of work, per process
+WORK_CLASSES = {
+    "extract": (int(os.environ.get("ASGI_EXTRACT_WORKERS", 8)), int(os.environ.get("ASGI_EXTRACT_QUEUE", 32))),
+    "download": (int(os.environ.get("ASGI_DOWNLOAD_WORKERS", 4)), int(os.environ.get("ASGI_DOWNLOAD_QUEUE", 16))),
+    "stream": (int(os.environ.get("ASGI_STREAM_WORKERS", 64)), int(os.environ.get("ASGI_STREAM_QUEUE", 0))),
+    "light": (int(os.environ.get("ASGI_LIGHT_WORKERS", 16)), int(os.environ.get("ASGI_LIGHT_QUEUE", 64)))
+}
+MAX_BODY_BYTES = int(os.environ.get("ASGI_MAX_BODY_BYTES", 1024 * 1024))
+BUSY_RETRY_AFTER = 5  # Seconds clients are asked to wait when a class is saturated
+
+# Flask endpoint -> class of work; endpoints not listed are "light"
+ENDPOINT_CLASSES = {
+    "health_check": "loop",
+    "get_video_info": "extract",
+    "get_video_info_batch": "extract",
+    "get_video_qualities": "extract",
+    "get_video_formats": "extract",
+    "download_video": "download",
+    "get_job_file": "download",
+    "stream_progress": "stream"
+}
+
+class WorkClass:
+    """Bounded executor for one class of blocking work
+
+    At most `workers` requests of the class run at once and at most
+    `queue_size` more wait for a slot; anything beyond that is turned away
+    with a 503 instead of piling up behind slow requests.
+    """
+    def __init__(self, name, workers, queue_size):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"asgi-{name}")
+        self._slots = None
+        self.waiting = 0
+
+    @property
+    def slots(self):
+        # Created on first use so it belongs to the server's event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        return self._slots
+
+    def admit(self):
+        return not self.slots.locked() or self.waiting < self.queue_size
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+class InlineClass:
+    """Cheap endpoints served directly on the event loop"""
+    name = "loop"
+
+    def admit(self):
+        return True
+
+    async def run(self, func, *args):
+        return func(*args)
+
+work_classes = {name: WorkClass(name, workers, queue_size) for name, (workers, queue_size) in WORK_CLASSES.items()}
+work_classes["loop"] = InlineClass()
+url_adapter = backend.app.url_map.bind("localhost")
+
+def classify(method, path):
+    """Class of work for a request, from the Flask endpoint it routes to"""
+    try:
+        endpoint, _ = url_adapter.match(path, method=method)
+    except HTTPException:
+        return work_classes["light"]
+    return work_classes[ENDPOINT_CLASSES.get(endpoint, "light")]
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP request"""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        # Each chunk is one executor round trip, so read files in larger blocks
+        "wsgi.file_wrapper": lambda file, buffer_size=8192: FileWrapper(file, max(buffer_size, backend.STREAM_CHUNK_SIZE))
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = scope["client"][0], str(scope["client"][1])
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin1"), value.decode("latin1")
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+        elif name != "content-length":
+            key = "HTTP_" + name.upper().replace("-", "_")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def call_wsgi(environ):
+    """Run the Flask app up to the start of its response"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers]
+        return lambda data: None
+
+    iterable = backend.app(environ, start_response)
+    iterator = iter(iterable)
+    # start_response may be deferred until the first chunk of a generator
+    first = next(iterator, None) if "status" not in started else b""
+    return started, iterable, iterator, first
+
+async def send_json(send, status, data, headers=()):
+    body = json.dumps(data).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + list(headers)
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def read_body(receive):
+    """Request body, or None if it is over MAX_BODY_BYTES"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return b""
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        if size > MAX_BODY_BYTES:
+            return None
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+async def handle_http(scope, receive, send):
+    work = classify(scope["method"], scope["path"])
+    if not work.admit():
+        metrics.inc("asgi_rejected_total", work_class=work.name)
+        await send_json(send, 503, {"error": "Server busy, try again shortly"},
+                        [(b"retry-after", str(BUSY_RETRY_AFTER).encode())])
+        return
+
+    body = await read_body(receive)
+    if body is None:
+        await send_json(send, 413, {"error": "Request too large"})
+        return
+    environ = build_environ(scope, body)
+
+    if isinstance(work, InlineClass):
+        await respond(work, environ, receive, send)
+        return
+
+    work.waiting += 1
+    metrics.add_gauge("asgi_queued_requests", 1, work_class=work.name)
+    try:
+        await work.slots.acquire()
+    finally:
+        work.waiting -= 1
+        metrics.add_gauge("asgi_queued_requests", -1, work_class=work.name)
+    try:
+        with metrics.active("asgi_active_requests", work_class=work.name):
+            await respond(work, environ, receive, send)
+    finally:
+        work.slots.release()
+
+async def respond(work, environ, receive, send):
+    """Run the Flask app for one request and relay its response"""
+    started, iterable, iterator, first = await work.run(call_wsgi, environ)
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({"type": "http.response.start", "status": started["status"], "headers": started["headers"]})
+        chunk = first
+        while chunk is not None and not disconnected.is_set():
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await work.run(next, iterator, None)
+        if not disconnected.is_set():
+            await send({"type": "http.response.body", "body": b""})
+    finally:
+        watcher.cancel()
+        # Closing releases storage pins and stops streaming generators
+        if hasattr(iterable, "close"):
+            await work.run(iterable.close)
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Blocking (extractor imports, storage scan), so kept off the event loop; a no-op after gunicorn's hooks
+            await asyncio.get_running_loop().run_in_executor(None, backend.start_up)
+            logger.info("Starting YouTube Downloader Backend v2.1 (ASGI)")
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for work in work_classes.values():
+                if isinstance(work, WorkClass):
+                    work.executor.shutdown(wait=False, cancel_futures=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "http":
+        await handle_http(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        await handle_lifespan(receive, send)
@@ -0,0 +1,460 @@
+"""Offline benchmark for the downloader backend.
+
+Swaps yt-dlp's YoutubeDL for a deterministic stand-in that serves synthetic
+info dicts and fetches real media files from a local HTTP server, then drives
+the Flask app over HTTP with repeatable scenarios:
+
+    python benchmark.py                      # every scenario
+    python benchmark.py --scenario playlist --playlist-size 100
+    python benchmark.py --json results.json  # keep results for comparison
+
+Each scenario reports p50/p99 latency, requests/sec, peak RSS and peak disk
+usage. Nothing talks to YouTube; if ffmpeg is installed the media files are
+real MP4/M4A clips, otherwise they are synthetic bytes of --media-size.
+The extraction scheduler runs with --extract-rate/--extract-burst (1000 by
+default) rather than the production limits, so it does not dominate the
+numbers; pass lower values to measure it.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+from io import BytesIO
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from PIL import Image
+from werkzeug.serving import make_server
+from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import FFmpegMergerPP, get_postprocessor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+class MediaServer:
+    """Local HTTP server for the media files and thumbnails the stub extractor points at"""
+    def __init__(self, directory, media_size):
+        self.directory = directory
+        self._create_media(media_size)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _create_media(self, media_size):
+        os.makedirs(self.directory, exist_ok=True)
+        video_path = os.path.join(self.directory, "video.mp4")
+        audio_path = os.path.join(self.directory, "audio.m4a")
+        if shutil.which("ffmpeg"):
+            subprocess.run([
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "lavfi", "-i", "testsrc=duration=5:size=640x360:rate=25",
+                "-f", "lavfi", "-i", "sine=duration=5",
+                "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", video_path
+            ], check=True)
+            subprocess.run([
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "lavfi", "-i", "sine=duration=5", "-c:a", "aac", audio_path
+            ], check=True)
+        else:
+            print("ffmpeg not found; serving synthetic media bytes", file=sys.stderr)
+            rng = random.Random(0)
+            for path in (video_path, audio_path):
+                with open(path, "wb") as f:
+                    f.write(rng.randbytes(media_size))
+
+        buffer = BytesIO()
+        Image.new("RGB", (1280, 720), (180, 30, 30)).save(buffer, "JPEG", quality=90)
+        with open(os.path.join(self.directory, "thumbnail.jpg"), "wb") as f:
+            f.write(buffer.getvalue())
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+
+class StubYoutubeDL:
+    """Deterministic stand-in for yt_dlp.YoutubeDL.
+
+    Video ids map to one synthetic info dict each; a playlist id of the form
+    PLbench<N> has N entries. Format selection is yt-dlp's own, run offline on
+    the synthetic formats, so size estimates and stream-through plans see the
+    same choices as in production. Downloads fetch the local media file over
+    HTTP and run the same progress, postprocessor and post hooks yt-dlp would.
+    """
+    media_base_url = None
+    media_dir = None
+    extract_delay = 0.0
+
+    def __init__(self, params=None):
+        self.params = dict(params or {})
+        self.format_selector = self.build_format_selector(self.params.get("format") or "bestvideo*+bestaudio/best")
+        self._selector_ydl = None
+
+    def build_format_selector(self, spec):
+        # Kept as the spec; _select() compiles it with a real YoutubeDL
+        return spec
+
+    def _select(self, info, spec):
+        if self._selector_ydl is None:
+            self._selector_ydl = YoutubeDL({"quiet": True, "no_warnings": True})
+        self._selector_ydl.format_selector = self._selector_ydl.build_format_selector(spec)
+        return self._selector_ydl.sanitize_info(self._selector_ydl.process_ie_result(info, download=False))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def sanitize_info(info, remove_private_keys=False):
+        return info
+
+    def _video_info(self, video_id):
+        rng = random.Random(video_id)
+        media_size = os.path.getsize(os.path.join(StubYoutubeDL.media_dir, "video.mp4"))
+        formats = [
+            {
+                "format_id": "140", "ext": "m4a", "acodec": "mp4a.40.2", "vcodec": "none", "abr": 129.5,
+                "filesize": os.path.getsize(os.path.join(StubYoutubeDL.media_dir, "audio.m4a")),
+                "url": f"{self.media_base_url}/audio.m4a?expire={int(time.time()) + 21600}"
+            },
+            {
+                "format_id": "18", "ext": "mp4", "acodec": "mp4a.40.2", "vcodec": "avc1.42001E",
+                "height": 360, "width": 640, "fps": 25, "filesize": media_size,
+                "url": f"{self.media_base_url}/video.mp4?expire={int(time.time()) + 21600}"
+            }
+        ]
+        return {
+            "id": video_id,
+            "title": f"Benchmark video {video_id}",
+            "description": "Synthetic benchmark video",
+            "duration": rng.randint(30, 900),
+            "uploader": "Benchmark Channel",
+            "view_count": rng.randint(0, 10 ** 6),
+            "like_count": rng.randint(0, 10 ** 4),
+            "upload_date": "20240101",
+            "thumbnail": f"{self.media_base_url}/thumbnail.jpg",
+            "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+            "formats": formats
+        }
+
+    def _playlist_info(self, playlist_id, flat):
+        size = int(playlist_id[len("PLbench"):] or 10) if playlist_id.startswith("PLbench") else 10
+        entries = []
+        for i in range(size):
+            video_id = f"{playlist_id[-4:]}{i:07d}"[-11:].rjust(11, "x")
+            if flat:
+                entries.append({
+                    "_type": "url", "ie_key": "Youtube", "id": video_id,
+                    "url": f"https://www.youtube.com/watch?v={video_id}",
+                    "title": f"Benchmark video {video_id}", "duration": 60
+                })
+            else:
+                entries.append(self._video_info(video_id))
+        return {
+            "_type": "playlist",
+            "id": playlist_id,
+            "title": f"Benchmark playlist {playlist_id}",
+            "uploader": "Benchmark Channel",
+            "playlist_count": size,
+            "entries": entries
+        }
+
+    def extract_info(self, url, download=True, process=True, **kwargs):
+        if self.extract_delay:
+            time.sleep(self.extract_delay)
+        parsed = urlparse(url if "://" in url else f"https://{url}")
+        query = parse_qs(parsed.query)
+        if query.get("list") and not self.params.get("noplaylist"):
+            flat = bool(self.params.get("extract_flat")) or not process
+            info = self._playlist_info(query["list"][0], flat)
+        else:
+            video_id = query["v"][0][:11] if query.get("v") else parsed.path.lstrip("/")[:11]
+            info = self._video_info(video_id)
+        if info.get("_type") == "playlist" and flat:
+            return info
+        return self.process_ie_result(info, download=download)
+
+    def process_ie_result(self, info, download=True, **kwargs):
+        if info.get("_type") == "playlist":
+            info["entries"] = [self.process_ie_result(entry, download) for entry in info["entries"]]
+            return info
+        if info.get("_type") in ("url", "url_transparent"):
+            info = self.extract_info(info["url"], download=False)
+        # Like yt-dlp, extraction already selects formats and leaves the choice in the info dict
+        info = self._select(info, self.format_selector)
+        if download:
+            self._download(info)
+        return info
+
+    def _output_ext(self):
+        for postprocessor in self.params.get("postprocessors", []):
+            if postprocessor.get("key") == "FFmpegExtractAudio":
+                return postprocessor.get("preferredcodec", "m4a"), "audio.m4a"
+        return self.params.get("merge_output_format") or "mp4", "video.mp4"
+
+    def _postprocessor_names(self, info):
+        # Hooks get pp_key(), e.g. "Merger" and "ExtractAudio", in the order yt-dlp runs the steps
+        names = []
+        if len(info.get("requested_formats") or ()) > 1:
+            names.append(FFmpegMergerPP.pp_key())
+        for postprocessor in self.params.get("postprocessors", []):
+            if postprocessor.get("when", "post_process") == "post_process":
+                names.append(get_postprocessor(postprocessor["key"]).pp_key())
+        return names
+
+    def _download(self, info):
+        ext, source = self._output_ext()
+        outtmpl = self.params.get("outtmpl", "%(title)s.%(ext)s")
+        if isinstance(outtmpl, dict):
+            outtmpl = outtmpl["default"]
+        path = outtmpl.replace("%(title)s", info["title"]).replace("%(id)s", info["id"]).replace("%(ext)s", ext)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        response = requests.get(f"{self.media_base_url}/{source}", stream=True, timeout=30)
+        response.raise_for_status()
+        total = int(response.headers.get("Content-Length") or 0)
+        done = 0
+        start = time.monotonic()
+        with open(f"{path}.part", "wb") as f:
+            for chunk in response.iter_content(64 * 1024):
+                f.write(chunk)
+                done += len(chunk)
+                elapsed = max(time.monotonic() - start, 1e-6)
+                for hook in self.params.get("progress_hooks", []):
+                    hook({
+                        "status": "downloading", "downloaded_bytes": done, "total_bytes": total,
+                        "speed": done / elapsed, "eta": 0, "filename": path, "info_dict": info
+                    })
+        os.replace(f"{path}.part", path)
+        for hook in self.params.get("progress_hooks", []):
+            hook({"status": "finished", "downloaded_bytes": done, "total_bytes": total, "filename": path, "info_dict": info})
+
+        for name in self._postprocessor_names(info):
+            for status in ("started", "finished"):
+                for hook in self.params.get("postprocessor_hooks", []):
+                    hook({"status": status, "postprocessor": name, "info_dict": info})
+
+        info["filepath"] = path
+        for hook in self.params.get("post_hooks", []):
+            hook(path)
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class DiskSampler:
+    """Samples disk usage of the working directory to find the peak"""
+    def __init__(self, path, interval=0.2):
+        self.path = path
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, directory_size(self.path))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, directory_size(self.path))
+
+def run_load(name, base_url, requests_list, concurrency, workdir):
+    """Issue (method, path, json) requests with bounded concurrency and summarise latencies"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def issue(item):
+        method, path, body = item
+        start = time.perf_counter()
+        try:
+            response = session.request(method, f"{base_url}{path}", json=body, timeout=600)
+            size = len(response.content)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            size, ok = 0, False
+        return time.perf_counter() - start, ok, size
+
+    with DiskSampler(workdir) as disk:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(issue, requests_list))
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _, _ in results]
+    return {
+        "scenario": name,
+        "requests": len(results),
+        "errors": sum(1 for _, ok, _ in results if not ok),
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "requests_per_sec": round(len(results) / elapsed, 2),
+        "bytes_received": sum(size for _, _, size in results),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_disk_mb": round(disk.peak / (1024 * 1024), 2)
+    }
+
+def video_id(prefix, i):
+    return f"{prefix}{i:010d}"
+
+def video_url(prefix, i):
+    return f"https://www.youtube.com/watch?v={video_id(prefix, i)}"
+
+def scenario_single(args, base_url, workdir):
+    items = []
+    for i in range(args.requests):
+        url = video_url("S", i)
+        items.append(("POST", "/api/info", {"url": url}))
+        items.append(("POST", "/api/download", {"url": url, "format": "mp4", "quality": "360"}))
+    return run_load("single_video", base_url, items, args.concurrency, workdir)
+
+def scenario_playlist(args, base_url, workdir):
+    url = f"https://www.youtube.com/playlist?list=PLbench{args.playlist_size}"
+    items = [
+        ("POST", "/api/info", {"url": url}),
+        ("POST", "/api/info", {"url": url, "flat": True, "limit": args.playlist_size}),
+        ("POST", "/api/download", {"url": url, "format": "mp4", "quality": "360"})
+    ]
+    return run_load(f"playlist_{args.playlist_size}", base_url, items, 1, workdir)
+
+def scenario_duplicates(args, base_url, workdir):
+    url = video_url("D", 0)
+    items = [("POST", "/api/download", {"url": url, "format": "mp4", "quality": "360"})] * args.requests
+    return run_load("duplicate_downloads", base_url, items, args.concurrency, workdir)
+
+def scenario_stream(args, base_url, workdir):
+    # Relayed straight from the source: an audio-only file and a single-file video
+    items = []
+    for i in range(args.requests):
+        url = video_url("R", i)
+        items.append(("POST", "/api/download", {"url": url, "format": "m4a", "audio_only": True, "stream": True}))
+        items.append(("POST", "/api/download", {"url": url, "format": "mp4", "quality": "360", "stream": True}))
+    return run_load("stream_through", base_url, items, args.concurrency, workdir)
+
+def scenario_thumbnails(args, base_url, workdir):
+    ids = [video_id("T", i) for i in range(max(args.requests // 10, 1))]
+    sizes = ["list", "card", "full"]
+    formats = ["jpeg", "webp"]
+    rng = random.Random(0)
+    items = [
+        ("GET", f"/api/thumbnail/{rng.choice(ids)}?size={rng.choice(sizes)}&format={rng.choice(formats)}", None)
+        for _ in range(args.requests * 10)
+    ]
+    return run_load("thumbnail_storm", base_url, items, args.concurrency, workdir)
+
+SCENARIOS = {
+    "single": scenario_single,
+    "playlist": scenario_playlist,
+    "duplicates": scenario_duplicates,
+    "stream": scenario_stream,
+    "thumbnails": scenario_thumbnails
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the downloader backend")
+    parser.add_argument("--scenario", choices=["all"] + list(SCENARIOS), default="all")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per scenario (thumbnails use 10x)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--playlist-size", type=int, default=100)
+    parser.add_argument("--media-size", type=int, default=2 * 1024 * 1024, help="Synthetic media bytes without ffmpeg")
+    parser.add_argument("--extract-delay", type=float, default=0.0, help="Simulated extractor latency in seconds")
+    # Production limits (1/s, burst 10) would measure the token bucket instead of the app
+    parser.add_argument("--extract-rate", type=float, default=1000.0, help="EXTRACT_RATE for the run")
+    parser.add_argument("--extract-burst", type=int, default=1000, help="EXTRACT_BURST for the run")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix="ytdl-bench-")
+    media = MediaServer(os.path.join(workdir, "media"), args.media_size)
+    media.start()
+    StubYoutubeDL.media_base_url = media.base_url
+    StubYoutubeDL.media_dir = media.directory
+    StubYoutubeDL.extract_delay = args.extract_delay
+
+    # The app creates its directories relative to the working directory
+    app_dir = os.path.join(workdir, "app")
+    os.makedirs(app_dir)
+    os.chdir(app_dir)
+    sys.path.insert(0, BACKEND_DIR)
+    # Read once when app is imported
+    os.environ["EXTRACT_RATE"] = str(args.extract_rate)
+    os.environ["EXTRACT_BURST"] = str(args.extract_burst)
+    import app as backend
+    print(f"extraction limits: rate={backend.EXTRACT_RATE:g}/s burst={backend.EXTRACT_BURST}")
+    backend.YoutubeDL = StubYoutubeDL
+    backend.THUMBNAIL_FALLBACK_URL = f"{media.base_url}/thumbnail.jpg?v={{video_id}}"
+    backend.app.root_path = app_dir
+    backend.logger.setLevel("WARNING")
+    logging.getLogger("werkzeug").setLevel("WARNING")
+
+    server = make_server("127.0.0.1", 0, backend.app, threaded=True)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = []
+    try:
+        for name in names:
+            result = SCENARIOS[name](args, base_url, app_dir)
+            results.append(result)
+            print(
+                f"{result['scenario']:<22} n={result['requests']:<5} err={result['errors']:<3} "
+                f"p50={result['p50_ms']:>9.1f}ms p99={result['p99_ms']:>9.1f}ms "
+                f"rps={result['requests_per_sec']:>8.1f} rss={result['peak_rss_mb']:>7.1f}MB "
+                f"disk={result['peak_disk_mb']:>8.1f}MB"
+            )
+    finally:
+        server.shutdown()
+        media.stop()
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(results, f, indent=2)
+        if not args.keep:
+            os.chdir(BACKEND_DIR)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
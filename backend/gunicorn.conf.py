@@ -0,0 +1,37 @@
+"""Gunicorn settings for app:app and asgi:app
+
+    gunicorn -c gunicorn.conf.py app:app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+The app is imported once in the master (preload_app) and the YouTube
+extractors are loaded there too, so workers fork with them already in
+memory. Storage reconciliation and the first cleanup run once in the
+master instead of once per worker. The master starts no threads, since it
+keeps forking replacement workers; each worker builds its own YoutubeDL
+instances and starts the hourly cleanup thread, of which only the one
+holding the cleanup lock in cache/ does any work.
+
+Workers are threaded: progress streams (SSE), NDJSON listings, streamed
+ZIPs and stream-through downloads hold their request open for minutes, so
+each takes one of a worker's threads rather than the whole worker, and
+/api/health and /api/info keep being answered next to them.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 3))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 32))  # Concurrent requests, open streams included, per worker
+timeout = 3000
+preload_app = True
+
+def when_ready(server):
+    import app as backend
+    
+    backend.start_up(worker=False)
+    server.log.info("YouTube extractors loaded, storage reconciled")
+
+def post_fork(server, worker):
+    import app as backend
+    
+    backend.start_up(server=False)
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="session")
+def backend(tmp_path_factory):
+    """The app module, imported in a scratch directory since it creates its directories in the working directory"""
+    previous = os.getcwd()
+    workdir = tmp_path_factory.mktemp("app")
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    import app
+    # send_file resolves relative paths against the app's root
+    app.app.root_path = str(workdir)
+    yield app
+    os.chdir(previous)
@@ -0,0 +1,40 @@
+import os
+import time
+import uuid
+import threading
+
+def test_identical_downloads_share_one_run(backend, monkeypatch):
+    runs = []
+    
+    def slow_download(url, format_type, quality, audio_only, session_id, concurrency, progress, priority,
+                      resume_key=None):
+        runs.append(url)
+        time.sleep(0.3)
+        path = os.path.join(backend.DOWNLOAD_DIR, f"{uuid.uuid4().hex}.mp4")
+        with open(path, "wb") as f:
+            f.write(b"video")
+        return {"path": path, "download_name": "video.mp4"}
+    
+    monkeypatch.setattr(backend, "_run_download", slow_download)
+    url = f"https://www.youtube.com/watch?v={uuid.uuid4().hex[:11]}"
+    artifacts = []
+    
+    def download():
+        artifacts.append(backend.run_download(url, "mp4", "best", False))
+    
+    threads = [threading.Thread(target=download) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(runs) == 1
+    assert len({artifact["path"] for artifact in artifacts}) == 1
+    for artifact in artifacts:
+        backend.storage.unpin(artifact["pin"])
+    
+    # Later requests are served from the cache
+    cached = backend.run_download(url, "mp4", "best", False)
+    backend.storage.unpin(cached["pin"])
+    assert len(runs) == 1
+    assert cached["path"] == artifacts[0]["path"]
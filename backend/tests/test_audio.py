@@ -0,0 +1,32 @@
+def audio_format(format_id, abr, acodec="mp4a.40.2", ext="m4a", language="en", language_preference=10):
+    return {
+        "format_id": format_id, "url": f"https://media.invalid/{format_id}", "protocol": "https",
+        "ext": ext, "acodec": acodec, "vcodec": "none", "abr": abr, "tbr": abr,
+        "language": language, "language_preference": language_preference
+    }
+
+def video_info(*formats):
+    return {
+        "id": "abcdefghijk", "title": "Test video", "extractor": "youtube", "extractor_key": "Youtube",
+        "webpage_url": "https://www.youtube.com/watch?v=abcdefghijk", "formats": list(formats)
+    }
+
+def test_original_language_wins_over_a_dub_with_higher_bitrate(backend):
+    info = video_info(
+        audio_format("140-0", 129.4),
+        audio_format("140-1", 129.6, language="es", language_preference=-1)
+    )
+    plan = backend.downloader.plan_audio("m4a", "128", info)
+    assert plan == {"format": "140-0", "copy": True}
+    # Stream-through and size estimation follow the same plan
+    assert [f["format_id"] for f in backend.select_formats(info, plan["format"])] == ["140-0"]
+
+def test_copyable_source_over_the_bitrate_cap_is_transcoded(backend):
+    info = video_info(audio_format("141", 256), audio_format("251", 160, acodec="opus", ext="webm"))
+    assert backend.downloader.plan_audio("m4a", "128", info) == {"format": "bestaudio/best", "copy": False}
+    assert backend.downloader.plan_audio("m4a", "best", info) == {"format": "141", "copy": True}
+
+def test_codec_must_fit_the_output(backend):
+    info = video_info(audio_format("251", 160, acodec="opus", ext="webm"))
+    assert backend.downloader.plan_audio("opus", "best", info) == {"format": "251", "copy": True}
+    assert backend.downloader.plan_audio("mp3", "best", info)["copy"] is False
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+@pytest.fixture
+def job_queue(backend, tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, "JOB_LEASE_TIMEOUT", 0.2)
+    # No job threads; the tests lease and complete jobs as workers would
+    return backend.DownloadJobQueue(str(tmp_path / "queue.sqlite3"), 0, 10)
+
+PARAMS = {"url": "https://www.youtube.com/watch?v=abcdefghijk", "format_type": "mp4", "quality": "best",
+          "audio_only": False}
+
+def test_job_of_a_crashed_worker_is_redelivered(job_queue):
+    job = job_queue.submit(PARAMS)
+    assert job_queue.lease("worker-a")["id"] == job["id"]
+    assert job_queue.lease("worker-b") is None
+    
+    # worker-a dies without sending heartbeats
+    time.sleep(0.3)
+    redelivered = job_queue.lease("worker-b")
+    assert redelivered["id"] == job["id"]
+    assert redelivered["attempts"] == 2
+    
+    # The first worker lost its lease, so neither its heartbeat nor its outcome counts
+    assert job_queue.heartbeat(job["id"], "worker-a") is False
+    job_queue.complete(job["id"], "worker-a", "failed", error="late", status_code=500)
+    assert job_queue.get(job["id"])["status"] == "running"
+    job_queue.complete(job["id"], "worker-b", "finished", file="/tmp/file.mp4", download_name="file.mp4")
+    assert job_queue.get(job["id"])["status"] == "finished"
+
+def test_heartbeats_keep_the_lease(job_queue):
+    job = job_queue.submit(PARAMS)
+    job_queue.lease("worker-a")
+    for _ in range(3):
+        time.sleep(0.1)
+        assert job_queue.heartbeat(job["id"], "worker-a") is True
+    assert job_queue.lease("worker-b") is None
+
+def test_job_interrupted_too_often_fails(backend, job_queue):
+    job = job_queue.submit(PARAMS)
+    for attempt in range(backend.JOB_MAX_ATTEMPTS):
+        assert job_queue.lease(f"worker-{attempt}")["id"] == job["id"]
+        time.sleep(0.3)
+    assert job_queue.lease("worker-last") is None
+    failed = job_queue.get(job["id"])
+    assert failed["status"] == "failed"
+    assert failed["status_code"] == 500
+
+def test_full_queue_refuses_jobs(backend, tmp_path):
+    job_queue = backend.DownloadJobQueue(str(tmp_path / "full.sqlite3"), 0, 1)
+    job_queue.submit(PARAMS)
+    with pytest.raises(backend.DownloadError) as excinfo:
+        job_queue.submit(PARAMS)
+    assert excinfo.value.status_code == 503
@@ -0,0 +1,51 @@
+import sys
+import json
+import subprocess
+
+import pytest
+
+from conftest import BACKEND_DIR
+
+# Forks a fresh interpreter that has no threads of its own, as gunicorn's master does with preload_app
+PREFILL_AFTER_FORK = """
+import os
+import sys
+import json
+
+sys.path.insert(0, {backend_dir!r})
+import app
+
+pool = app.YoutubeDLPool(2, 10)
+pool.prefill(1)
+read_end, write_end = os.pipe()
+pid = os.fork()
+if pid == 0:
+    pool.prefill(2)
+    os.write(write_end, json.dumps(pool.stats()).encode())
+    os._exit(0)
+os.close(write_end)
+os.waitpid(pid, 0)
+with os.fdopen(read_end) as f:
+    print(json.dumps({{"child": json.loads(f.read()), "endpoints": len(app.scheduler.endpoints)}}))
+"""
+
+def test_prefill_after_fork_keeps_what_it_builds(tmp_path):
+    result = subprocess.run(
+        [sys.executable, "-c", PREFILL_AFTER_FORK.format(backend_dir=BACKEND_DIR)],
+        cwd=tmp_path, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    # Instances built before the fork are dropped, and the two built after it are kept
+    assert output["child"]["idle"] == 2 * output["endpoints"]
+
+def test_borrow_rejects_params_a_reused_instance_would_ignore(backend):
+    pool = backend.YoutubeDLPool(2, 10)
+    with pytest.raises(ValueError):
+        with pool.borrow(proxy="http://127.0.0.1:9"):
+            pass
+    with pool.borrow(extract_flat="in_playlist") as ydl:
+        assert ydl.params["extract_flat"] == "in_playlist"
+    # The override does not outlive the loan
+    with pool.borrow() as ydl:
+        assert ydl.params.get("extract_flat") is False
@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+from yt_dlp.postprocessor import FFmpegExtractAudioPP, FFmpegFixupM4aPP, FFmpegMergerPP
+
+def start_acquire(pool):
+    """Take and free a slot of pool in a thread, which finishes only once a slot is free"""
+    waiter = threading.Thread(target=lambda: pool.release(pool.acquire()), daemon=True)
+    waiter.start()
+    return waiter
+
+@pytest.mark.parametrize("pp_class", [FFmpegMergerPP, FFmpegExtractAudioPP, FFmpegFixupM4aPP])
+def test_ffmpeg_step_holds_a_slot_until_finished(backend, tmp_path, pp_class):
+    pool = backend.PostprocessPool(str(tmp_path), 1, 1)
+    started = []
+    with pool.hooks(on_start=lambda: started.append(True)) as hook:
+        # yt-dlp reports each step under pp_key(), e.g. "Merger" for FFmpegMergerPP
+        hook({"status": "started", "postprocessor": pp_class.pp_key()})
+        waiter = start_acquire(pool)
+        waiter.join(timeout=1)
+        assert waiter.is_alive(), f"{pp_class.pp_key()} ran without a slot"
+        
+        hook({"status": "finished", "postprocessor": pp_class.pp_key()})
+        waiter.join(timeout=5)
+        assert not waiter.is_alive(), f"{pp_class.pp_key()} kept its slot"
+    assert started == [True]
+
+def test_other_postprocessors_run_without_a_slot(backend, tmp_path):
+    pool = backend.PostprocessPool(str(tmp_path), 1, 1)
+    started = []
+    with pool.hooks(on_start=lambda: started.append(True)) as hook:
+        hook({"status": "started", "postprocessor": "MetadataParser"})
+        waiter = start_acquire(pool)
+        waiter.join(timeout=5)
+        assert not waiter.is_alive()
+    assert started == []
+
+def test_slots_held_by_unfinished_steps_are_freed_on_exit(backend, tmp_path):
+    pool = backend.PostprocessPool(str(tmp_path), 1, 1)
+    with pool.hooks() as hook:
+        hook({"status": "started", "postprocessor": FFmpegMergerPP.pp_key()})
+    waiter = start_acquire(pool)
+    waiter.join(timeout=5)
+    assert not waiter.is_alive()
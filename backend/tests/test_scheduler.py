@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+
+import pytest
+
+class PlaylistYoutubeDL:
+    """Returns a fully extracted playlist, as extract_info(download=False) does without extract_flat"""
+    def __init__(self, entries):
+        self.entries = entries
+    
+    def extract_info(self, url, download=True):
+        return {
+            "_type": "playlist", "id": "PLtest", "title": "Test playlist",
+            "entries": [{"id": f"video{i:06d}", "title": f"Video {i}"} for i in range(self.entries)]
+        }
+    
+    def sanitize_info(self, info):
+        return info
+
+class StubPool:
+    def __init__(self, ydl):
+        self.ydl = ydl
+    
+    @contextmanager
+    def borrow(self, endpoint=None, **params):
+        yield self.ydl
+
+@pytest.fixture
+def scheduler(backend, tmp_path, monkeypatch):
+    # One endpoint, ten tokens, and a refill too slow to matter during a test
+    scheduler = backend.ExtractionScheduler(str(tmp_path / "scheduler.sqlite3"), [None], [None], 0.001, 10, 3)
+    monkeypatch.setattr(backend, "scheduler", scheduler)
+    monkeypatch.setattr(backend, "metadata_cache", backend.MetadataCache(str(tmp_path / "metadata.sqlite3"), 60, 10, 1 << 20))
+    return scheduler
+
+def test_playlist_extraction_drains_the_bucket(backend, scheduler, monkeypatch):
+    monkeypatch.setattr(backend, "ydl_pool", StubPool(PlaylistYoutubeDL(entries=25)))
+    backend.extract_info_cached("https://www.youtube.com/playlist?list=PLtest")
+    
+    assert scheduler.stats()[0]["tokens"] < 0
+    with pytest.raises(backend.DownloadError) as excinfo:
+        scheduler.acquire("interactive", max_wait=1)
+    assert excinfo.value.status_code == 429
+
+def test_rate_limited_endpoint_backs_off(backend, scheduler):
+    with pytest.raises(RuntimeError):
+        with scheduler.slot("interactive"):
+            raise RuntimeError("HTTP Error 429: Too Many Requests")
+    
+    endpoint = scheduler.stats()[0]
+    assert endpoint["backoff_level"] == 1
+    assert endpoint["backoff_seconds"] >= backend.EXTRACT_BACKOFF_BASE * 0.8 - 1
+    # Requests wait out the backoff rather than reaching YouTube again
+    with pytest.raises(backend.DownloadError):
+        scheduler.acquire("interactive", max_wait=1)
+    assert scheduler.retry_after() >= backend.EXTRACT_BACKOFF_BASE * 0.8 - 1
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+def bytes_served(backend):
+    counters = backend.metrics.collect()[0]
+    return counters.get(("bytes_served_total", ()), 0)
+
+@pytest.fixture
+def stored_file(backend):
+    path = os.path.join(backend.DOWNLOAD_DIR, "send-test.bin")
+    with open(path, "wb") as f:
+        f.write(os.urandom(100000))
+    yield path
+    os.remove(path)
+
+def test_whole_file_counts_its_size(backend, stored_file):
+    before = bytes_served(backend)
+    with backend.app.test_request_context("/"):
+        response = backend.send_download(stored_file, "file.bin")
+        body = b"".join(response.response)
+        response.response.close()
+    assert len(body) == 100000
+    assert bytes_served(backend) - before == 100000
+
+def test_ranged_and_aborted_transfers_count_what_was_sent(backend, stored_file):
+    before = bytes_served(backend)
+    with backend.app.test_request_context("/", headers={"Range": "bytes=0-999"}):
+        response = backend.send_download(stored_file, "file.bin")
+        assert response.status_code == 206
+        assert len(b"".join(response.response)) == 1000
+        response.response.close()
+    assert bytes_served(backend) - before == 1000
+    
+    with backend.app.test_request_context("/"):
+        response = backend.send_download(stored_file, "file.bin")
+        first = next(iter(response.response))
+        response.response.close()  # Client went away after the first chunk
+    assert bytes_served(backend) - before == 1000 + len(first)
+    assert len(first) < 100000
@@ -0,0 +1,19 @@
+import pytest
+
+def test_guard_aborts_once_all_files_together_pass_the_limit(backend):
+    guard = backend.SizeGuard(limit=1000)
+    guard.hook({"status": "downloading", "filename": "video.mp4", "downloaded_bytes": 300, "total_bytes": 600})
+    guard.hook({"status": "downloading", "filename": "audio.m4a", "downloaded_bytes": 300})
+    assert not guard.exceeded
+    
+    with pytest.raises(backend.SizeLimitExceeded):
+        guard.hook({"status": "downloading", "filename": "audio.m4a", "downloaded_bytes": 500})
+    assert guard.exceeded
+    # Every later hook call, e.g. from another playlist entry, aborts too
+    with pytest.raises(backend.SizeLimitExceeded):
+        guard.hook({"status": "downloading", "filename": "other.mp4", "downloaded_bytes": 1})
+
+def test_guard_ignores_other_hook_statuses(backend):
+    guard = backend.SizeGuard(limit=1000)
+    guard.hook({"status": "error", "filename": "video.mp4", "downloaded_bytes": 5000})
+    assert not guard.exceeded
@@ -0,0 +1,64 @@
+import os
+import time
+
+import pytest
+
+@pytest.fixture
+def storage(backend, tmp_path):
+    return backend.StorageManager(str(tmp_path / "storage.sqlite3"), 2500)
+
+def write(tmp_path, name, size=1000):
+    path = str(tmp_path / name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    # Distinct last_access times, as eviction goes by them
+    time.sleep(0.01)
+    return path
+
+def test_least_recently_used_download_is_evicted(storage, tmp_path):
+    old = write(tmp_path, "old.mp4")
+    storage.register(old, "download")
+    used = write(tmp_path, "used.mp4")
+    storage.register(used, "download")
+    storage.touch(old)
+    
+    storage.register(write(tmp_path, "new.mp4"), "download")
+    assert os.path.exists(old)
+    assert not os.path.exists(used)
+    assert storage.stats()["bytes"]["download"] == 2000
+
+def test_pinned_download_is_never_evicted(storage, tmp_path):
+    pinned = write(tmp_path, "pinned.mp4")
+    storage.register(pinned, "download")
+    token = storage.pin(pinned)
+    other = write(tmp_path, "other.mp4")
+    storage.register(other, "download")
+    
+    storage.register(write(tmp_path, "new.mp4"), "download")
+    assert os.path.exists(pinned)
+    assert not os.path.exists(other)
+    
+    # Once unpinned it is the oldest again
+    storage.unpin(token)
+    storage.register(write(tmp_path, "newer.mp4"), "download")
+    assert not os.path.exists(pinned)
+
+def test_partial_downloads_count_against_the_budget(storage, tmp_path):
+    partial = str(tmp_path / "partial_abc")
+    os.makedirs(partial)
+    write(tmp_path, "partial_abc/video.mp4.part")
+    storage.register(partial, "partial")
+    download = write(tmp_path, "done.mp4")
+    storage.register(download, "download")
+    
+    storage.register(write(tmp_path, "new.mp4"), "download")
+    assert not os.path.exists(partial)
+    assert os.path.exists(download)
+
+def test_everything_pinned_leaves_the_budget_exceeded(storage, tmp_path):
+    paths = [write(tmp_path, f"{i}.mp4") for i in range(3)]
+    for path in paths:
+        storage.register(path, "download")
+        storage.pin(path)
+    assert storage.enforce_budget() == 0
+    assert all(os.path.exists(path) for path in paths)
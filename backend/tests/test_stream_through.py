@@ -0,0 +1,22 @@
+import pytest
+
+from test_audio import audio_format, video_info
+
+@pytest.fixture
+def ffmpeg(backend, monkeypatch):
+    monkeypatch.setattr(backend.shutil, "which", lambda name: f"/usr/bin/{name}")
+
+def test_plain_m4a_is_relayed_as_is(backend, ffmpeg):
+    plan = backend.plan_stream_through(video_info(audio_format("140", 129.5)), "m4a", "best", True)
+    assert plan["direct"] is True
+
+def test_dash_m4a_is_remuxed_through_ffmpeg(backend, ffmpeg):
+    source = dict(audio_format("140", 129.5), container="m4a_dash")
+    plan = backend.plan_stream_through(video_info(source), "m4a", "best", True)
+    assert plan["direct"] is False
+    assert [f["format_id"] for f in plan["formats"]] == ["140"]
+
+def test_dash_m4a_is_staged_without_ffmpeg(backend, monkeypatch):
+    monkeypatch.setattr(backend.shutil, "which", lambda name: None)
+    source = dict(audio_format("140", 129.5), container="m4a_dash")
+    assert backend.plan_stream_through(video_info(source), "m4a", "best", True) is None
@@ -0,0 +1,30 @@
+from concurrent.futures import Future
+
+import requests
+
+def test_slow_origin_gets_504_with_retry_after(backend, monkeypatch):
+    pending = Future()  # A fetch that never completes
+    monkeypatch.setattr(backend, "THUMBNAIL_FETCH_TIMEOUT", 0.1)
+    monkeypatch.setattr(backend, "schedule_thumbnail", lambda info: pending)
+    
+    response = backend.app.test_client().get("/api/thumbnail/slowslowslo")
+    assert response.status_code == 504
+    assert response.headers["Retry-After"] == str(backend.THUMBNAIL_RETRY_AFTER)
+
+def test_failed_fetch_is_not_repeated_until_it_expires(backend, monkeypatch):
+    fetches = []
+    
+    def not_found(url, **kwargs):
+        fetches.append(url)
+        raise requests.HTTPError("404 Client Error: Not Found")
+    
+    monkeypatch.setattr(backend.http_session, "get", not_found)
+    client = backend.app.test_client()
+    assert client.get("/api/thumbnail/missingmiss").status_code == 404
+    assert client.get("/api/thumbnail/missingmiss?size=list").status_code == 404
+    assert len(fetches) == 1
+    
+    monkeypatch.setattr(backend, "THUMBNAIL_FAILURE_TTL", 0)
+    backend._failed_thumbnails["missingmiss"] = 0
+    assert client.get("/api/thumbnail/missingmiss").status_code == 404
+    assert len(fetches) == 2
@@ -0,0 +1,57 @@
+"""Standalone download worker.
+
+Runs queued download jobs ("async": true requests) outside the API:
+
+    python worker.py --threads 4
+
+Jobs are leased from the queue database in JOB_DIR. Any number of workers,
+on any number of nodes, can serve the same queue as long as JOB_DIR and
+downloads/ are on a volume they all share with the API. cache/ holds state
+that belongs to one host (rate limits, FFmpeg slots sized from its CPUs,
+WAL-mode databases): mount it into every API and worker container on a
+host so they share one rate limiter and one FFmpeg slot pool, but keep it
+local to each node. Scheduler limits are therefore per node, and N nodes
+together extract up to N times EXTRACT_RATE. Set JOB_WORKERS=0 for the
+API so that it only accepts jobs and reports on them. A worker that stops
+sending heartbeats loses its jobs to the others after JOB_LEASE_TIMEOUT
+seconds.
+
+SIGTERM or Ctrl-C stops taking new jobs and waits for the running ones; a
+second signal exits at once, and the jobs it was running are redelivered.
+"""
+import os
+import signal
+import socket
+import argparse
+from threading import Event
+
+import app as backend
+from app import logger
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued download jobs")
+    parser.add_argument("--threads", type=int, default=max(backend.JOB_WORKERS, 1),
+                        help="jobs to run at once (default: JOB_WORKERS, at least 1)")
+    args = parser.parse_args()
+
+    stop = Event()
+
+    def shut_down(signum, frame):
+        if stop.is_set():
+            raise SystemExit(1)
+        logger.info("Worker stopping after its running jobs finish")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shut_down)
+    signal.signal(signal.SIGINT, shut_down)
+
+    backend.warm_up()
+    threads = backend.job_queue.start(workers=args.threads, stop=stop)
+    logger.info(f"Download worker {socket.gethostname()}:{os.getpid()} running {len(threads)} job threads")
+    while any(thread.is_alive() for thread in threads):
+        # Joining with a timeout keeps the main thread responsive to signals
+        for thread in threads:
+            thread.join(timeout=1)
+
+if __name__ == "__main__":
+    main()